@@ -145,5 +145,9 @@ setup(
 
     extras_require={
         # eg: 'rst': ['docutils>=0.11'],
+        # stream large scans rather than loading them at once
+        'stream': ['ijson'],
+        # faster sorted-merge checksum joins
+        'merge': ['numpy'],
     }
 )
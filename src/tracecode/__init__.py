@@ -26,12 +26,27 @@
 from __future__ import absolute_import
 
 
-from pkg_resources import get_distribution, DistributionNotFound
+# NOTE: keep this module light: the matchers and their ScanCode dependencies
+# are not imported here such that "tracecode --version" or "--help" start fast.
+# Import the tracecode.matchers and tracecode.utils modules explicitly.
+# The version is read with importlib.metadata when available as this is much
+# faster to import than pkg_resources.
 try:
-    __version__ = get_distribution('tracecode-toolkit').version
-except DistributionNotFound:
+    from importlib.metadata import version as _get_version
+    from importlib.metadata import PackageNotFoundError as _PackageNotFoundError
+except ImportError:
+    try:
+        from importlib_metadata import version as _get_version
+        from importlib_metadata import PackageNotFoundError as _PackageNotFoundError
+    except ImportError:
+        from pkg_resources import DistributionNotFound as _PackageNotFoundError
+        from pkg_resources import get_distribution
+
+        def _get_version(name):
+            return get_distribution(name).version
+
+try:
+    __version__ = _get_version('tracecode-toolkit')
+except _PackageNotFoundError:
     # package is not installed ??
     __version__ = '1.0.0'
-
-from tracecode import matchers
-from tracecode import utils
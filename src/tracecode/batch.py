@@ -0,0 +1,158 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+
+from collections import OrderedDict
+import io
+import multiprocessing
+import os
+
+import simplejson
+
+from tracecode.incremental import get_scan_hashes
+from tracecode.matchers import DeploymentAnalysis
+from tracecode.matchers import DevelopIndex
+from tracecode.matchers import INDEX_JOIN
+from tracecode.output import write_json
+from tracecode.utils import string_types
+
+
+"""
+Analyze one develop codebase against several deploy codebases, loading and
+indexing the develop scan only once in each process for all of them.
+"""
+
+
+def load_manifest(location):
+    """
+    Return a list of (deploy scan location, output location) from the JSON
+    manifest file at `location`: a list of {"deploy": path, "output": path}
+    objects. Relative paths are relative to the manifest directory. Raise a
+    ValueError if the manifest is not valid.
+    """
+    with io.open(location, 'rb') as manifest:
+        entries = simplejson.load(manifest)
+    if not isinstance(entries, list):
+        raise ValueError('The manifest is not a list of {"deploy": path, "output": path} objects.')
+
+    base_dir = os.path.dirname(os.path.abspath(location))
+    targets = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            raise ValueError('The manifest entry is not an object: {!r}'.format(entry))
+        paths = [entry.get('deploy'), entry.get('output')]
+        if not all(path and isinstance(path, string_types) for path in paths):
+            raise ValueError(
+                'The manifest entry has no "deploy" or "output" path: {!r}'.format(entry))
+        targets.append(tuple(os.path.join(base_dir, path) for path in paths))
+    return targets
+
+
+def get_targets(deploys, output_dir):
+    """
+    Return a list of (deploy scan location, output location) for each of the
+    `deploys` scan locations with an output file named after the deploy scan
+    in `output_dir`.
+    """
+    targets = []
+    names = set()
+    for deploy in deploys:
+        name = os.path.basename(deploy)
+        if not name.endswith('.json'):
+            name += '.json'
+        base_name = name
+        count = 1
+        while name in names:
+            count += 1
+            name = '{}-{}'.format(count, base_name)
+        names.add(name)
+        targets.append((deploy, os.path.join(output_dir, name)))
+    return targets
+
+
+def run_batch(develop_scan, targets, options, processes=1, compact=False,
+              timing=False, checksum_join=INDEX_JOIN, lean=False, develop_hash=None):
+    """
+    Analyze the `develop_scan` develop scan against each of the `targets`
+    iterable of (deploy scan location, output location, deploy scan) and write
+    the JSON results of each analysis to its output location. Yield (deploy
+    scan location, output location) for each analysis as completed.
+
+    The develop and deploy scans are the values returned by validate_scan for
+    their scan locations: either this location or the already decoded scan.
+
+    The analyses are run in parallel using `processes` processes if more than
+    one. The develop scan is then loaded and indexed once in each process
+    rather than pickled, such that this works with any multiprocessing start
+    method. `options` are the analysis options where "--deploy" is set for each
+    deploy scan. If the `develop_hash` content hash of the develop scan is
+    provided, the content hashes of the scans are reported in each output.
+    """
+    tasks = ((deploy, output, deploy_scan, options, compact, timing, checksum_join, lean,
+              develop_hash)
+             for deploy, output, deploy_scan in targets)
+
+    if processes <= 1:
+        _init_batch_worker(develop_scan, lean)
+        for task in tasks:
+            yield _run_batch_task(task)
+        return
+
+    pool = multiprocessing.Pool(
+        processes, initializer=_init_batch_worker, initargs=(develop_scan, lean))
+    try:
+        for done in pool.imap(_run_batch_task, tasks):
+            yield done
+    finally:
+        pool.close()
+        pool.join()
+
+
+# The DevelopIndex shared by the analyses of a worker process
+_worker_develop_index = None
+
+
+def _init_batch_worker(develop_scan, lean):
+    global _worker_develop_index
+    _worker_develop_index = DevelopIndex.from_location(develop_scan, lean=lean)
+
+
+def _run_batch_task(task):
+    (deploy, output, deploy_scan, options, compact, timing, checksum_join, lean,
+     develop_hash) = task
+    options = OrderedDict(options)
+    options['--deploy'] = deploy
+    scan_hashes = None
+    if develop_hash:
+        scan_hashes = get_scan_hashes(options['--develop'], deploy, develop_hash=develop_hash)
+    analysis = DeploymentAnalysis(
+        develop_json_location=options.get('--develop'), deploy_json_location=deploy_scan,
+        options=options, lean=lean, checksum_join=checksum_join,
+        develop_index=_worker_develop_index, scan_hashes=scan_hashes)
+    with io.open(output, 'wb') as outfile:
+        write_json(analysis=analysis, outfile=outfile, compact=compact, timing=timing)
+    return deploy, output
@@ -0,0 +1,143 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+
+import gc
+import hashlib
+import io
+import os
+import tempfile
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from commoncode.system import on_windows
+
+from tracecode import __version__
+
+
+"""
+On-disk cache of DeployIndex keyed by the content hash of deploy scan files,
+such that analyses against the same deploy scan skip loading and indexing it.
+
+Only the flat structures of an index are cached: its list of paths and its
+arrays of sorted checksums. The path index is rebuilt from the paths when
+loaded, which is much faster than pickling and loading its many nodes.
+
+The cached indexes are pickled: loading a cached index can run arbitrary code.
+Only use a cache directory that no untrusted user can write to.
+"""
+
+# Bump this when the structure returned by DeployIndex.to_arrays changes
+CACHE_FORMAT = 5
+
+
+def get_scan_hash(location):
+    """
+    Return a hex digest of the content of the scan file at `location`.
+    """
+    digest = hashlib.sha256()
+    with io.open(location, 'rb') as scan:
+        for chunk in iter(lambda: scan.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_cache_location(cache_dir, scan_hash):
+    """
+    Return the location of the cached deploy index for a `scan_hash` in the
+    `cache_dir` directory.
+    """
+    return os.path.join(cache_dir, 'deploy-index-{}.pickle'.format(scan_hash))
+
+
+def load_deploy_index(cache_dir, scan_hash):
+    """
+    Return a DeployIndex cached in `cache_dir` for the deploy scan file with
+    the `scan_hash` content hash or None if there is no usable cached index.
+    """
+    cache_location = get_cache_location(cache_dir, scan_hash)
+    if not os.path.exists(cache_location):
+        return None
+    # imported only when needed as this is slow to import
+    from tracecode.matchers import DeployIndex
+
+    # the garbage collector would otherwise run many times for nothing while
+    # loading the paths and rebuilding the path index nodes
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        try:
+            with io.open(cache_location, 'rb') as cached:
+                cache_format, version, arrays = pickle.load(cached)
+        except Exception:
+            return None
+        if cache_format != CACHE_FORMAT or version != __version__:
+            return None
+        return DeployIndex.from_arrays(*arrays)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def replace_file(source, target):
+    """
+    Move the `source` file to `target`, replacing an existing `target` file
+    atomically when possible.
+    """
+    replace = getattr(os, 'replace', None)
+    if replace:
+        replace(source, target)
+        return
+    # Python 2: rename does not replace an existing file on Windows
+    if on_windows and os.path.exists(target):
+        os.remove(target)
+    os.rename(source, target)
+
+
+def save_deploy_index(cache_dir, scan_hash, deploy_index):
+    """
+    Save the `deploy_index` DeployIndex of the deploy scan file with the
+    `scan_hash` content hash in the `cache_dir` directory.
+    """
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+    cache_location = get_cache_location(cache_dir, scan_hash)
+
+    # write to a temp file first, so that a partial cache is never loaded
+    fd, temp_location = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as cached:
+            pickle.dump((CACHE_FORMAT, __version__, deploy_index.to_arrays()), cached,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        replace_file(temp_location, cache_location)
+    except Exception:
+        if os.path.exists(temp_location):
+            os.remove(temp_location)
+        raise
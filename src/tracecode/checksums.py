@@ -0,0 +1,255 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+from __future__ import division
+
+from array import array
+import binascii
+
+try:
+    # optional: used to sort and join large arrays of digests faster
+    import numpy
+except ImportError:
+    numpy = None
+
+
+"""
+Match checksums with a sorted-merge join of arrays of fixed-width binary
+digests rather than with a mapping of hex checksum strings, using only a few
+bytes of memory for each checksum.
+"""
+
+# number of bytes of the binary digest of each checksum type
+DIGEST_SIZES = {
+    'md5': 16,
+    'sha1': 20,
+    'sha256': 32,
+    'sha512': 64,
+}
+
+
+class SortedChecksums(object):
+    """
+    The checksums of the `checksumtype` type of a sequence of items, as an array
+    of fixed-width binary digests sorted with an array of the ids of their items.
+    Items with the same checksum are kept in their original order.
+
+    `checksums_and_ids` is an iterable of (hex checksum, item integer id). Empty
+    checksums are ignored. Checksums that are not hex digests of the expected
+    size are kept in a mapping of {checksum: [id, ...]} instead.
+    """
+
+    def __init__(self, checksumtype, checksums_and_ids):
+        self.checksumtype = checksumtype
+        self.size = size = DIGEST_SIZES[checksumtype]
+        digests = bytearray()
+        ids = array('L')
+        self.others = {}
+
+        for checksum, item_id in checksums_and_ids:
+            if not checksum:
+                continue
+            digest = get_digest(checksum, size)
+            if digest is None:
+                self.others.setdefault(checksum, []).append(item_id)
+            else:
+                digests.extend(digest)
+                ids.append(item_id)
+
+        self.digests, self.ids = sort_digests(digests, ids, size)
+
+    @classmethod
+    def from_arrays(cls, checksumtype, digests, ids, others):
+        """
+        Return a new SortedChecksums of the `checksumtype` type from the
+        `digests`, `ids` and `others` attributes of a SortedChecksums, such as
+        saved in a cache.
+        """
+        sorted_checksums = cls(checksumtype, ())
+        sorted_checksums.digests = digests
+        sorted_checksums.ids = ids
+        sorted_checksums.others = others
+        return sorted_checksums
+
+    def __len__(self):
+        return len(self.ids) + sum(len(ids) for ids in self.others.values())
+
+    def get_digest(self, index):
+        """
+        Return the binary digest at `index` in the sorted digests.
+        """
+        size = self.size
+        return bytes(self.digests[index * size:(index + 1) * size])
+
+    def join(self, other):
+        """
+        Return a ChecksumsJoin of the items of the `other` SortedChecksums that
+        have the same checksum as some items of this SortedChecksums. Both
+        sorted arrays are joined in a single merge.
+        """
+        if numpy is not None:
+            other_ids, starts, ends = self._join_with_numpy(other)
+        else:
+            other_ids, starts, ends = self._join(other)
+
+        ids = self.ids
+        for checksum, checksum_other_ids in other.others.items():
+            checksum_ids = self.others.get(checksum)
+            if not checksum_ids:
+                continue
+            if ids is self.ids:
+                ids = array('L', self.ids)
+            start = len(ids)
+            ids.extend(checksum_ids)
+            for other_id in checksum_other_ids:
+                other_ids.append(other_id)
+                starts.append(start)
+                ends.append(len(ids))
+
+        return ChecksumsJoin(*sort_join(other_ids, starts, ends), ids=ids)
+
+    def _join(self, other):
+        get_digest = self.get_digest
+        get_other_digest = other.get_digest
+        count = len(self.ids)
+        other_count = len(other.ids)
+        other_ids = array('L')
+        starts = array('L')
+        ends = array('L')
+        i = j = 0
+        while i < count and j < other_count:
+            digest = get_digest(i)
+            other_digest = get_other_digest(j)
+            if digest < other_digest:
+                i += 1
+            elif digest > other_digest:
+                j += 1
+            else:
+                end = i + 1
+                while end < count and get_digest(end) == digest:
+                    end += 1
+                while j < other_count and get_other_digest(j) == digest:
+                    other_ids.append(other.ids[j])
+                    starts.append(i)
+                    ends.append(end)
+                    j += 1
+                i = end
+        return other_ids, starts, ends
+
+    def _join_with_numpy(self, other):
+        dtype = 'S{}'.format(self.size)
+        digests = numpy.frombuffer(self.digests, dtype=dtype)
+        other_digests = numpy.frombuffer(other.digests, dtype=dtype)
+        starts = numpy.searchsorted(digests, other_digests, side='left')
+        ends = numpy.searchsorted(digests, other_digests, side='right')
+        found = numpy.nonzero(ends > starts)[0]
+        other_ids = numpy.frombuffer(other.ids, dtype='L')[found]
+        return tuple(to_array(values) for values in (other_ids, starts[found], ends[found]))
+
+
+class ChecksumsJoin(object):
+    """
+    The result of a SortedChecksums join as flat arrays sorted on the other
+    item ids: the other item `other_ids[i]` has the same checksum as the items
+    `ids[starts[i]:ends[i]]`, in their original order. Only a few bytes are
+    used for each joined item and the other items are walked in order of
+    their ids with a cursor.
+    """
+
+    def __init__(self, other_ids, starts, ends, ids):
+        self.other_ids = other_ids
+        self.starts = starts
+        self.ends = ends
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.other_ids)
+
+    def __iter__(self):
+        """
+        Yield a tuple of (other item id, array of item ids) in other item ids
+        order.
+        """
+        for other_id, start, end in zip(self.other_ids, self.starts, self.ends):
+            yield other_id, self.ids[start:end]
+
+
+def sort_join(other_ids, starts, ends):
+    """
+    Return a tuple of the `other_ids`, `starts` and `ends` arrays sorted on
+    the other ids.
+    """
+    if numpy is not None:
+        order = numpy.argsort(numpy.frombuffer(other_ids, dtype='L'), kind='mergesort')
+        return tuple(to_array(numpy.frombuffer(values, dtype='L')[order])
+                     for values in (other_ids, starts, ends))
+
+    order = sorted(range(len(other_ids)), key=other_ids.__getitem__)
+    return tuple(array('L', (values[i] for i in order)) for values in (other_ids, starts, ends))
+
+
+def to_array(values):
+    """
+    Return an array of unsigned longs with the integers of the `values` numpy
+    array, copied from its bytes rather than as Python integers.
+    """
+    return array('L', values.astype('L').tobytes())
+
+
+def get_digest(checksum, size):
+    """
+    Return the binary digest of a lowercase hex `checksum` or None if this is
+    not a hex digest of `size` bytes.
+    """
+    if len(checksum) != size * 2 or checksum.lower() != checksum:
+        return None
+    try:
+        return binascii.unhexlify(checksum.encode('ascii'))
+    except (TypeError, ValueError, UnicodeError):
+        return None
+
+
+def sort_digests(digests, ids, size):
+    """
+    Return a tuple of (digests, ids) of the `digests` bytearray of `size` bytes
+    digests and their `ids` array sorted on the digests, keeping the original
+    order of equal digests.
+
+    Without numpy, the digests are sorted with a key object for each of them:
+    this fallback uses much more memory and is only meant for small inputs.
+    """
+    if numpy is not None:
+        sorted_digests = numpy.frombuffer(digests, dtype='S{}'.format(size))
+        order = numpy.argsort(sorted_digests, kind='mergesort')
+        return (bytearray(sorted_digests[order].tobytes()),
+                to_array(numpy.frombuffer(ids, dtype='L')[order]))
+
+    order = sorted(range(len(ids)), key=lambda i: digests[i * size:(i + 1) * size])
+    sorted_digests = bytearray()
+    for i in order:
+        sorted_digests.extend(digests[i * size:(i + 1) * size])
+    return sorted_digests, array('L', (ids[i] for i in order))
@@ -24,32 +24,56 @@
 #
 
 from __future__ import absolute_import
-from tracecode.utils import is_json_path
-from tracecode.utils import get_notice
-from tracecode import matchers
+from tracecode.utils import validate_scan
+from tracecode import cache
+from tracecode import profiling
+from tracecode import utils
 from tracecode import __version__
+from tracecode.output import get_query_result
+from tracecode.output import write_json
+from tracecode.output import write_jsonl
 import simplejson
 
 from collections import OrderedDict
+import io
+import os
 
 import click
 click.disable_unicode_literals_warning = True
 
 
-def write_json(analysis, outfile):
+class ProgressBars(object):
     """
-    Write the data from the `analysis` DeploymentAnalysis as JSON to `outfile`.
+    A progress callback rendering a click progress bar on stderr for each
+    analysis phase.
     """
-    results = OrderedDict([
-        ('tracecode_notice', get_notice()),
-        ('tracecode_options', analysis.options),
-        ('tracecode_version', __version__),
-        ('tracecode_errors', analysis.errors),
-        ('tracecode_results', analysis.analysed_result.values()),
-    ])
 
-    simplejson.dump(results, outfile, iterable_as_array=True, indent=2)
-    outfile.write('\n')
+    def __init__(self):
+        self.bar = None
+        self.phase = None
+
+    def __call__(self, progress):
+        if progress.phase != self.phase:
+            self.close()
+            self.phase = progress.phase
+            self.bar = click.progressbar(
+                length=progress.total, label=progress.phase.capitalize(),
+                show_pos=True, item_show_func=format_progress,
+                file=click.get_text_stream('stderr'))
+            self.bar.__enter__()
+        self.bar.current_item = progress
+        self.bar.update(progress.processed - self.bar.pos)
+
+    def close(self):
+        if self.bar is not None:
+            self.bar.__exit__(None, None, None)
+            self.bar = None
+
+
+def format_progress(progress):
+    if progress is None:
+        return
+    return '{} matched, {:.0f} files/s'.format(progress.matches, progress.throughput)
 
 
 def print_version(ctx, param, value):
@@ -59,35 +83,357 @@ def print_version(ctx, param, value):
     ctx.exit()
 
 
-@click.command()
-@click.option('--develop', required=True, prompt=False,
+def run_batch_analysis(develop, deploys, manifest, output_dir, compact, lean,
+                       processes, checksum_join, timing, scan_hashes, other_options):
+    """
+    Analyze the `develop` scan against each of the `deploys` scans or of the
+    deploy scans of the `manifest`, loading the develop scan only once in each
+    process.
+    """
+    if any(other_options):
+        raise click.UsageError(
+            'Only --compact, --lean, --processes, --checksum-join, --timing and '
+            '--scan-hashes can be used with several deploy codebases.')
+    if deploys and not output_dir:
+        raise click.UsageError('--output-dir is required with several --deploy.')
+
+    # imported only when running an analysis as this is slow to import
+    from tracecode import batch
+
+    targets = []
+    if manifest:
+        try:
+            targets.extend(batch.load_manifest(manifest))
+        except ValueError as e:
+            raise click.UsageError('Invalid --manifest {}: {}'.format(manifest, e))
+    if deploys:
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        targets.extend(batch.get_targets(deploys, output_dir))
+
+    develop_scan = validate_scan(develop)
+    if not develop_scan:
+        click.echo('Develop path is not a json file:' + develop)
+        return
+    options = OrderedDict([('--develop', develop)])
+    if lean:
+        options['--lean'] = lean
+    if checksum_join != 'index':
+        options['--checksum-join'] = checksum_join
+    if timing:
+        options['--timing'] = timing
+    develop_hash = None
+    if scan_hashes:
+        options['--scan-hashes'] = scan_hashes
+        develop_hash = cache.get_scan_hash(develop)
+
+    done = batch.run_batch(
+        develop_scan, iter_valid_targets(targets), options, processes=processes, compact=compact,
+        timing=timing, checksum_join=checksum_join, lean=lean, develop_hash=develop_hash)
+    for deploy, output in done:
+        click.echo('Analyzed {} in {}'.format(deploy, output), err=True)
+
+
+def iter_valid_targets(targets):
+    """
+    Yield (deploy scan location, output location, deploy scan) for each of the
+    `targets` list of (deploy scan location, output location) with a valid
+    deploy scan, where the deploy scan is returned by validate_scan such that
+    it is not decoded again. The deploy scans are validated lazily as the
+    targets are consumed rather than all at once.
+    """
+    for deploy, output in targets:
+        deploy_scan = validate_scan(deploy)
+        if deploy_scan:
+            yield deploy, output, deploy_scan
+        else:
+            click.echo('Deploy path is not a json file: ' + deploy)
+
+
+@click.group(invoke_without_command=True)
+@click.option('--develop', prompt=False,
               type=click.Path(exists=True, readable=True),
               help='Path to the "development" codebase scan file')
-@click.option('--deploy', required=True, prompt=False,
+@click.option('--deploy', prompt=False, multiple=True,
               type=click.Path(exists=True, readable=True),
-              help='Path to the "deployed" codebase scan file')
-@click.option('-j', '--json', prompt=False, default='-',
+              help='Path to the "deployed" codebase scan file. Can be repeated to '
+                   'analyze the develop codebase against several deploy codebases '
+                   'with one result file each in --output-dir.')
+@click.option('--manifest', prompt=False, default=None,
+              type=click.Path(exists=True, readable=True, dir_okay=False),
+              help='Path to a JSON manifest listing the deploy codebases to analyze '
+                   'the develop codebase against as {"deploy": path, "output": path} '
+                   'objects, with one result file each.')
+@click.option('--output-dir', prompt=False, default=None,
+              type=click.Path(file_okay=False, writable=True),
+              help='Directory where to write one .json result file named after each '
+                   'deploy scan file when several --deploy are used.')
+@click.option('-j', '--json', prompt=False, default=None,
+              type=click.File(mode='wb', lazy=False),
+              help='Path of the .json output file. Use "-" for on screen display. '
+                   'This is the default unless --jsonl is used.')
+@click.option('--jsonl', prompt=False, default=None,
               type=click.File(mode='wb', lazy=False),
-              help='Path of the .json output file. Use "-" for on screen display.')
+              help='Path of the .jsonl JSON Lines output file with a first headers '
+                   'line then one line for each develop file. Use "-" for on screen display.')
+@click.option('--compact', is_flag=True, default=False,
+              help='Write compact JSON without indentation.')
+@click.option('--lean', is_flag=True, default=False,
+              help='Load only the scan data used for matching. Develop files are '
+                   'then reported only with their path, type and checksums.')
+@click.option('-n', '--processes', type=int, default=1, show_default=True,
+              help='Run path matching in parallel using this number of processes. '
+                   'With several deploy codebases, analyze these in parallel instead.')
+@click.option('--checksum-join', type=click.Choice(['index', 'merge']), default='index',
+              show_default=True,
+              help='Match checksums with an index of the deploy checksums or with a '
+                   'sorted-merge join of binary digests that uses much less memory. '
+                   'The merge join requires the optional numpy library.')
+@click.option('--directory-match', is_flag=True, default=False,
+              help='Also pair the develop and deploy directories whose subtrees share most '
+                   'of their files, report these directory matches and path match the files '
+                   'of a paired directory only with the files of its deploy directories.')
+@click.option('--java-match', is_flag=True, default=False,
+              help='Also match each develop Java source file with the deploy class files of '
+                   'its outer and inner classes by their fully qualified class name.')
+@click.option('--out-of-core', is_flag=True, default=False,
+              help='Load the scans in a temporary SQLite database and match them there '
+                   'rather than in memory, for very large scans. Develop files are then '
+                   'reported as with --lean. Requires the optional ijson library.')
+@click.option('--incremental', prompt=False, default=None,
+              type=click.Path(exists=True, readable=True, dir_okay=False),
+              help='Path to the .json output of a previous analysis run with --scan-hashes. '
+                   'Only the develop files affected by the changes since the scans of this '
+                   'previous analysis are matched again and the previous matches of the other '
+                   'files are reused. The scans of the previous analysis must be kept '
+                   'unchanged: this is checked with their content hashes.')
+@click.option('--scan-hashes', is_flag=True, default=False,
+              help='Report the SHA256 content hashes of the develop and deploy scans in a '
+                   '"tracecode_scan_hashes" section of the JSON output, such that this '
+                   'analysis can be reused later with --incremental. This reads both scans '
+                   'once more.')
+@click.option('--progress', is_flag=True, default=False,
+              help='Show the progress of the matching on stderr.')
+@click.option('--timing', is_flag=True, default=False,
+              help='Report the time and memory used by each analysis phase in a '
+                   '"tracecode_timings" section at the end of the JSON output.')
+@click.option('--profile', prompt=False, default=None,
+              type=click.Path(dir_okay=False, writable=True),
+              help='Profile the analysis with cProfile and save the statistics to this '
+                   'file for use with the Python pstats module.')
+@click.option('--profile-counters', prompt=False, default=None,
+              type=click.Path(dir_okay=False, writable=True),
+              help='Save to this JSON file the calls, time spent, candidates and pruned '
+                   'paths counts of the path matching functions. This slows down the analysis.')
+@click.option('--index-cache', prompt=False, default=None,
+              type=click.Path(file_okay=False, writable=True),
+              help='Directory where to cache the index of a deploy scan and reuse it '
+                   'in later runs against the same deploy scan. The cached indexes are '
+                   'pickled: only use a directory that no untrusted user can write to.')
 @click.help_option('-h', '--help')
 @click.option('--version', is_flag=True, is_eager=True, expose_value=False, callback=print_version, help='Show the version and exit.')
-def cli(develop, deploy, json):
+@click.pass_context
+def cli(ctx, develop, deploy, manifest, output_dir, json, jsonl, compact, lean, processes,
+        checksum_join, directory_match, java_match, out_of_core, incremental, scan_hashes,
+        progress, timing, profile, profile_counters, index_cache):
     """
     Command to accept location of deploy and develop json inputs, run the
     tracecode scan and return the expected same paths set by comparison of paths.
     """
+    if ctx.invoked_subcommand:
+        return
+    if not develop:
+        raise click.UsageError('Missing option "--develop".')
+    if not deploy and not manifest:
+        raise click.UsageError('Missing option "--deploy".')
+    if checksum_join == 'merge':
+        # imported only when needed as numpy is slow to import
+        from tracecode import checksums
+        if checksums.numpy is None:
+            raise click.UsageError(
+                '--checksum-join merge requires the optional numpy library to sort the '
+                'checksums: install it with "pip install tracecode-toolkit[merge]".')
+    if manifest or len(deploy) > 1:
+        return run_batch_analysis(
+            develop, deploy, manifest, output_dir, compact=compact, lean=lean,
+            processes=processes, checksum_join=checksum_join, timing=timing,
+            scan_hashes=scan_hashes, other_options=(json, jsonl, directory_match, java_match, out_of_core, incremental,
+                           progress, profile, profile_counters, index_cache))
+    deploy = deploy[0]
+
     options = OrderedDict([
         ('--develop', develop),
         ('--deploy', deploy),
     ])
+    if lean:
+        options['--lean'] = lean
+    if processes > 1:
+        options['--processes'] = processes
+    if checksum_join != 'index':
+        options['--checksum-join'] = checksum_join
+    if directory_match:
+        options['--directory-match'] = directory_match
+    if java_match:
+        options['--java-match'] = java_match
+    if out_of_core:
+        options['--out-of-core'] = out_of_core
+    if incremental:
+        options['--incremental'] = incremental
+    if scan_hashes:
+        options['--scan-hashes'] = scan_hashes
+    if timing:
+        options['--timing'] = timing
+
+    if out_of_core and (incremental or index_cache):
+        raise click.UsageError(
+            '--out-of-core cannot be combined with --incremental or --index-cache.')
+    if (directory_match or java_match) and (out_of_core or incremental):
+        raise click.UsageError(
+            '--directory-match and --java-match cannot be combined with '
+            '--out-of-core or --incremental.')
+    if out_of_core and not utils.ijson:
+        raise click.UsageError(
+            '--out-of-core requires the optional ijson library to stream the scans: '
+            'install it with "pip install tracecode-toolkit[stream]".')
 
-    if not is_json_path(develop):
+    deploy_hash = None
+    deploy_index = None
+    if index_cache:
+        # the content hash of the deploy scan keys its cached index
+        deploy_hash = cache.get_scan_hash(deploy)
+        deploy_index = cache.load_deploy_index(index_cache, deploy_hash)
+
+    # each scan is decoded at most once: either validated from its start
+    # only, or fully decoded here and handed over to the analysis
+    develop_scan = validate_scan(develop)
+    if not develop_scan:
         click.echo('Develop path is not a json file:' + develop)
-        return
-    if not is_json_path(deploy):
+    # a cached deploy index was built from a valid scan
+    deploy_scan = deploy if deploy_index else validate_scan(deploy)
+    if not deploy_scan:
         click.echo('Deploy path is not a json file: ' + deploy)
+    if not develop_scan or not deploy_scan:
         return
 
-    analysis = matchers.DeploymentAnalysis(
-        develop_json_location=develop, deploy_json_location=deploy, options=options)
-    write_json(analysis=analysis, outfile=json)
+    # imported only when running an analysis as this is slow to import
+    from tracecode import matchers
+    from tracecode.incremental import get_scan_hashes
+    from tracecode.incremental import PreviousAnalysis
+
+    hashes = None
+    if scan_hashes:
+        hashes = get_scan_hashes(develop, deploy, deploy_hash=deploy_hash)
+
+    previous = None
+    if incremental:
+        try:
+            previous = PreviousAnalysis(incremental)
+        except Exception as e:
+            raise click.ClickException('Cannot use previous analysis: {}'.format(e))
+
+    progress_bars = ProgressBars() if progress else None
+    counters = profiling.MatchingCounters() if profile_counters else None
+
+    with profiling.profiled(stats_location=profile, counters=counters):
+        try:
+            if out_of_core:
+                from tracecode.database import SqliteDeploymentAnalysis
+                analysis = SqliteDeploymentAnalysis(
+                    develop_json_location=develop_scan, deploy_json_location=deploy_scan,
+                    options=options, progress=progress_bars, scan_hashes=hashes)
+            else:
+                analysis = matchers.DeploymentAnalysis(
+                    develop_json_location=develop_scan, deploy_json_location=deploy_scan,
+                    options=options, lean=lean, processes=processes, deploy_index=deploy_index,
+                    progress=progress_bars, previous=previous, checksum_join=checksum_join,
+                    directory_match=directory_match, java_match=java_match,
+                    scan_hashes=hashes)
+        finally:
+            if progress_bars:
+                progress_bars.close()
+
+        if index_cache and not deploy_index:
+            cache.save_deploy_index(index_cache, deploy_hash, analysis.deploy_index)
+        if json is None and jsonl is None:
+            json = click.open_file('-', mode='wb')
+
+        if json is not None:
+            write_json(analysis=analysis, outfile=json, compact=compact, timing=timing)
+        if jsonl is not None:
+            write_jsonl(analysis=analysis, outfile=jsonl, timing=timing)
+        if out_of_core:
+            analysis.close()
+
+    if counters:
+        with io.open(profile_counters, 'wb') as out:
+            out.write(simplejson.dumps(counters.counters, indent=2).encode('utf-8'))
+
+
+@cli.command()
+@click.option('--port', type=int, default=8765, show_default=True,
+              help='Port to listen to on the loopback interface.')
+@click.option('--cache-size', type=int, default=1024, show_default=True,
+              help='Memory budget in MB of the loaded scans kept in cache, '
+                   'approximated by the size of their scan files.')
+@click.help_option('-h', '--help')
+def serve(port, cache_size):
+    """
+    Run a local TraceCode HTTP server that keeps the most recently used scans
+    loaded and indexed. POST to /analyze a {"develop": path, "deploy": path}
+    JSON object to get the analysis results, or POST to /query a {"deploy":
+    path, "path": develop path, "checksums": {type: value}} JSON object to get
+    the deployed_to matches of a single develop file.
+
+    The server has no authentication and reads any scan file path it is sent:
+    it only listens on the loopback interface.
+    """
+    from tracecode import server
+    httpd = server.make_server(port=port, cache_size=cache_size * 1024 * 1024)
+    click.echo('Serving TraceCode on http://{}:{}/'.format(*httpd.server_address[:2]), err=True)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+@cli.command()
+@click.argument('path')
+@click.option('--deploy', required=True, prompt=False,
+              type=click.Path(exists=True, readable=True),
+              help='Path to the "deploy" scan JSON file.')
+@click.option('--sha1', help='SHA1 checksum of the develop file.')
+@click.option('--md5', help='MD5 checksum of the develop file.')
+@click.option('--sha256', help='SHA256 checksum of the develop file.')
+@click.option('--sha512', help='SHA512 checksum of the develop file.')
+@click.option('--index-cache', type=click.Path(file_okay=False, writable=True),
+              help='Directory to cache the deploy scan index, keyed by the scan content, '
+                   'such that later queries against the same deploy scan skip indexing it. '
+                   'The cached indexes are pickled: only use a directory that no untrusted '
+                   'user can write to.')
+@click.help_option('-h', '--help')
+def query(path, deploy, sha1, md5, sha256, sha512, index_cache):
+    """
+    Print as JSON where the develop file with PATH and optional checksums is
+    deployed: the same deployed_to matches as a full analysis.
+    """
+    deploy_index = None
+    if index_cache:
+        deploy_hash = cache.get_scan_hash(deploy)
+        deploy_index = cache.load_deploy_index(index_cache, deploy_hash)
+
+    if not deploy_index:
+        deploy_scan = validate_scan(deploy)
+        if not deploy_scan:
+            click.echo('Deploy path is not a json file: ' + deploy)
+            return
+        # imported only when needed as this is slow to import
+        from tracecode.matchers import DeployIndex
+        deploy_index = DeployIndex.from_location(deploy_scan)
+        if index_cache:
+            cache.save_deploy_index(index_cache, deploy_hash, deploy_index)
+
+    checksums = dict(sha1=sha1, md5=md5, sha256=sha256, sha512=sha512)
+    deployed_to = deploy_index.query(path, checksums)
+    click.echo(simplejson.dumps(get_query_result(path, deployed_to), indent=2))
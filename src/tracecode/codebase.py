@@ -0,0 +1,185 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+from __future__ import absolute_import
+
+from collections import OrderedDict
+import io
+
+import attr
+import simplejson
+
+try:
+    # optional: used to stream large scans rather than loading them at once
+    import ijson
+except ImportError:
+    ijson = None
+
+
+"""
+A lean codebase loaded from a ScanCode JSON scan that keeps only the few
+resource fields used for matching, rather than every scanned attribute of
+each file as a scancode.resource.VirtualCodebase does.
+"""
+
+
+@attr.s(slots=True)
+class LeanResource(object):
+    """
+    Base class for the resources of a LeanCodebase. A sub-class with one
+    attribute for each kept field is created for each LeanCodebase.
+    """
+    path = attr.ib()
+    type = attr.ib(default='file')
+
+    @property
+    def is_file(self):
+        return self.type == 'file'
+
+    def to_dict(self):
+        return attr.asdict(self, dict_factory=OrderedDict)
+
+
+class LeanCodebase(object):
+    """
+    A codebase of LeanResource loaded from the JSON scan file at `location` or
+    from an already decoded scan mapping, keeping only the path, the type and
+    the `fields` of each resource.
+
+    If the optional ijson library is installed, the scan "files" array is
+    streamed and only the kept fields values are ever decoded. Otherwise the
+    scan is loaded at once.
+    """
+
+    def __init__(self, location, fields=()):
+        self.location = location
+        self.fields = tuple(fields)
+        # LeanResource sub-class created with the kept fields present in the scan
+        self.resource_class = None
+        self.resource_fields = ()
+        self.resources = []
+        self._populate()
+
+    def _populate(self):
+        """
+        Load the resources sorted in the same top-down order as a
+        VirtualCodebase walk.
+        """
+        resources = [self._create_resource(data)
+                     for data in self._get_resources_data()]
+        if not resources:
+            raise Exception('Input has no file-level scan results.')
+
+        # create the missing parent directories as a VirtualCodebase does
+        parent_paths = set()
+        for resource in resources:
+            parent_path = resource.path.rstrip('/').rpartition('/')[0]
+            while parent_path and parent_path not in parent_paths:
+                parent_paths.add(parent_path)
+                parent_path = parent_path.rpartition('/')[0]
+        missing_paths = parent_paths.difference(r.path for r in resources)
+        resources.extend(self.resource_class(path=path, type='directory')
+                         for path in sorted(missing_paths))
+
+        self.resources = sorted(
+            resources, key=lambda r: get_walk_key(r.path, r.path in parent_paths))
+
+    def _get_resources_data(self):
+        """
+        Yield a mapping of the path, type and kept fields for each resource
+        of the scan.
+        """
+        return iter_resources_data(self.location, ('path', 'type',) + self.fields)
+
+    def _create_resource(self, data):
+        if self.resource_class is None:
+            # keep only the fields present in the scan as ScanCode does
+            self.resource_fields = ('path', 'type',) + tuple(
+                field for field in self.fields if field in data)
+            attributes = OrderedDict(
+                (field, attr.ib(default=None)) for field in self.resource_fields[2:])
+            self.resource_class = attr.make_class(
+                str('ScannedLeanResource'), attributes, slots=True, bases=(LeanResource,))
+        fields = self.resource_fields
+        return self.resource_class(**dict((k, v) for k, v in data.items() if k in fields))
+
+    def walk(self):
+        """
+        Yield all the resources of this codebase, walking top-down.
+        """
+        return iter(self.resources)
+
+
+def iter_resources_data(location, fields):
+    """
+    Yield a mapping of {field: value} with only the `fields` for each resource
+    of the JSON scan file at `location` or of an already decoded scan mapping.
+    The scan file is streamed if the optional ijson library is installed.
+    """
+    if isinstance(location, dict):
+        files = location.get('files') or []
+    elif ijson:
+        with io.open(location, 'rb') as scan:
+            for data in iter_files_data(scan, fields):
+                yield data
+        return
+    else:
+        with io.open(location, 'rb') as scan:
+            files = simplejson.load(scan).get('files') or []
+
+    for data in files:
+        yield dict((k, v) for k, v in data.items() if k in fields)
+
+
+def iter_files_data(scan, fields):
+    """
+    Yield a mapping of {field: value} for each item of the "files" array of
+    the `scan` JSON file-like object, using ijson events such that the value of
+    fields not in `fields` (such as licenses or copyrights) are never built.
+    """
+    kept_prefixes = dict(('files.item.' + field, field) for field in fields)
+    data = None
+    for prefix, event, value in ijson.parse(scan):
+        if prefix == 'files.item':
+            if event == 'start_map':
+                data = {}
+            elif event == 'end_map':
+                yield data
+                data = None
+        elif data is not None and prefix in kept_prefixes:
+            if event not in ('start_map', 'end_map', 'start_array', 'end_array', 'map_key'):
+                data[kept_prefixes[prefix]] = value
+
+
+def get_walk_key(path, has_children):
+    """
+    Return a sort key for a resource `path` so that sorted resources are in the
+    same order as a top-down VirtualCodebase walk: parents first, and siblings
+    with no children first, then by case-insensitive name.
+    """
+    segments = path.strip('/').split('/')
+    last = len(segments) - 1
+    return tuple((i < last or has_children, segment.lower(), segment)
+                 for i, segment in enumerate(segments))
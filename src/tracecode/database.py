@@ -0,0 +1,400 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+from __future__ import division
+
+from collections import OrderedDict
+from itertools import groupby
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from tracecode.codebase import get_walk_key
+from tracecode.codebase import iter_resources_data
+from tracecode.matchers import CHECKSUM_MATCH
+from tracecode.matchers import CHECKSUM_TYPES
+from tracecode.matchers import EXACT_CONFIDENCE
+from tracecode.matchers import HIGH_CONFIDENCE
+from tracecode.matchers import MATCH_KINDS
+from tracecode.matchers import MatchedResource
+from tracecode.matchers import PATH_MATCH
+from tracecode.matchers import PathIndex
+from tracecode.matchers import get_match_kind_code
+from tracecode.matchers import get_path_key
+from tracecode.progress import ProgressReporter
+from tracecode.timing import timed
+
+
+"""
+An out-of-core analysis engine that loads the develop and deploy scans in an
+indexed SQLite database rather than in memory, matches checksums with SQL joins
+and streams the results from the database, such that the analysis of very large
+codebases only needs a small and mostly constant amount of memory.
+"""
+
+# number of rows inserted or updated at once
+BATCH_SIZE = 10000
+
+# rank of the path matches: checksum matches are ranked in the CHECKSUM_TYPES
+# order of precedence before these
+PATH_MATCH_RANK = len(CHECKSUM_TYPES)
+
+# the develop resources of a stem group are compared with each deploy resource
+# of the group only up to this many deploy resources, otherwise these are
+# matched with a PathIndex of the group
+MAX_COMPARED_CANDIDATES = 16
+
+
+class SqliteDeploymentAnalysis(object):
+    """
+    A DeploymentAnalysis computed in an SQLite database at `db_location` or in
+    a temporary database if not provided. The results are the same as a lean
+    DeploymentAnalysis: the develop resources are reported only with their path,
+    type and checksums.
+
+    The database has a table for the develop and the deploy resources each with
+    their checksums, path key and base name stem, indexed for matching, and a
+    table of the matches of a develop resource to a deploy resource.
+    """
+
+    def __init__(self, develop_json_location, deploy_json_location, options,
+                 db_location=None, progress=None, scan_hashes=None):
+        self.develop = develop_json_location
+        self.deploy = deploy_json_location
+        self.options = options
+        self.scan_hashes = scan_hashes
+        self.progress = progress
+        self.errors = []
+        # mapping of {phase: {wall_time, cpu_time, peak_rss}}
+        self.timings = OrderedDict()
+
+        self.temp_dir = None
+        if not db_location:
+            self.temp_dir = tempfile.mkdtemp(prefix='tracecode-')
+            db_location = os.path.join(self.temp_dir, 'tracecode.sqlite')
+        self.db_location = db_location
+        self.connection = sqlite3.connect(db_location)
+        create_tables(self.connection)
+
+        # the develop fields reported in the results
+        self.resource_fields = ()
+        with timed(self.timings, 'loading'):
+            self.resource_fields = load_resources(self.connection, 'develop', self.develop)
+            load_resources(self.connection, 'deploy', self.deploy)
+        with timed(self.timings, 'indexing'):
+            create_indexes(self.connection)
+
+        self.analysed_result = SqliteResults(self)
+        self.compute()
+
+    def compute(self):
+        """
+        Compute (or re-compute) the analysis, and store results.
+        """
+        with self.connection:
+            self.connection.execute('DELETE FROM matches')
+        with timed(self.timings, 'checksum_matching'):
+            self.checksum_match()
+        with timed(self.timings, 'path_matching'):
+            self.path_match()
+
+    def checksum_match(self):
+        """
+        Match the develop and deploy resources with the same checksum with a
+        join for each checksum type.
+        """
+        with self.connection:
+            for rank, checksumtype in enumerate(CHECKSUM_TYPES):
+                self.connection.execute(
+                    'INSERT INTO matches (develop_id, deploy_id, rank) '
+                    'SELECT develop.id, deploy.id, ? FROM develop '
+                    'JOIN deploy ON develop.{0} = deploy.{0} '
+                    "WHERE develop.{0} IS NOT NULL AND develop.{0} != ''".format(checksumtype),
+                    (rank,))
+
+    def path_match(self):
+        """
+        Match the develop and deploy resources on their longest common path
+        suffix as a PathIndex does. The develop and deploy resources are read
+        sorted by base name stem such that only the deploy resources with the
+        same stem as a develop resource are ever in memory and compared. Large
+        stem groups such as `__init__.py` files are matched with a PathIndex
+        of the group rather than compared with each deploy resource.
+        """
+        connection = self.connection
+        develop_count = connection.execute('SELECT COUNT(*) FROM develop').fetchone()[0]
+        reporter = ProgressReporter(self.progress, 'path matching', develop_count)
+
+        develop_rows = connection.cursor().execute(
+            'SELECT id, key, stem FROM develop WHERE stem IS NOT NULL ORDER BY stem')
+        deploy_rows = connection.cursor().execute(
+            'SELECT id, key, stem, path FROM deploy WHERE stem IS NOT NULL '
+            'ORDER BY stem, walk_key')
+
+        develop_groups = groupby(develop_rows, key=lambda row: row[2])
+        deploy_groups = groupby(deploy_rows, key=lambda row: row[2])
+
+        matches = []
+        processed = 0
+        matched = 0
+        deploy_stem, deploy_group = next(deploy_groups, (None, None))
+        for develop_stem, develop_group in develop_groups:
+            while deploy_stem is not None and deploy_stem < develop_stem:
+                deploy_stem, deploy_group = next(deploy_groups, (None, None))
+
+            develop_group = list(develop_group)
+            processed += len(develop_group)
+            if processed >= reporter.next_check > 0:
+                reporter.update(processed, matched)
+
+            if deploy_stem != develop_stem:
+                continue
+
+            # the deploy resources with this stem in walk order
+            deploy_group = list(deploy_group)
+            if len(develop_group) > 1 and len(deploy_group) > MAX_COMPARED_CANDIDATES:
+                group_index = PathIndex(path for _, _, _, path in deploy_group)
+                ids_by_path = dict((path, deploy_id) for deploy_id, _, _, path in deploy_group)
+                get_tops = lambda key: [ids_by_path[path] for path in group_index.match(None, key)]
+            else:
+                candidates = [(deploy_id, key.split('/')) for deploy_id, key, _, _ in deploy_group]
+                get_tops = lambda key: get_top_matches(key, candidates)
+            deploy_stem, deploy_group = next(deploy_groups, (None, None))
+
+            for develop_id, develop_key, _ in develop_group:
+                tops = get_tops(develop_key.split('/'))
+                if tops:
+                    matched += 1
+                matches.extend((develop_id, deploy_id, PATH_MATCH_RANK) for deploy_id in tops)
+
+            if len(matches) >= BATCH_SIZE:
+                insert_matches(connection, matches)
+                matches = []
+
+        insert_matches(connection, matches)
+        reporter.finish(matched)
+
+    def close(self):
+        """
+        Close the database and delete it if temporary.
+        """
+        self.connection.close()
+        if self.temp_dir:
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+
+class SqliteResults(object):
+    """
+    The results of an SqliteDeploymentAnalysis streamed from its database in
+    the same order as the results of a DeploymentAnalysis.
+    """
+
+    def __init__(self, analysis):
+        self.analysis = analysis
+
+    def __len__(self):
+        return self.analysis.connection.execute(
+            'SELECT COUNT(DISTINCT develop_id) FROM matches').fetchone()[0]
+
+    def values(self):
+        """
+        Yield a SqliteResult for each develop resource with matches.
+        """
+        fields = self.analysis.resource_fields
+        checksum_kinds = [get_match_kind_code(CHECKSUM_MATCH, EXACT_CONFIDENCE, checksumtype)
+                          for checksumtype in CHECKSUM_TYPES]
+        kinds = checksum_kinds + [get_match_kind_code(PATH_MATCH, HIGH_CONFIDENCE)]
+
+        # a deploy resource matched more than once is kept with its best rank
+        # and the develop resources with checksum matches come first, as
+        # these are matched first by a DeploymentAnalysis
+        rows = self.analysis.connection.cursor().execute(
+            'WITH kept AS ('
+            '  SELECT develop_id, deploy_id, MIN(rank) AS rank FROM matches '
+            '  GROUP BY develop_id, deploy_id), '
+            'firsts AS ('
+            '  SELECT develop_id, MIN(rank) AS first_rank FROM kept GROUP BY develop_id) '
+            'SELECT develop.id, {}, deploy.path, kept.rank FROM kept '
+            'JOIN firsts ON firsts.develop_id = kept.develop_id '
+            'JOIN develop ON develop.id = kept.develop_id '
+            'JOIN deploy ON deploy.id = kept.deploy_id '
+            'ORDER BY firsts.first_rank = ?, develop.walk_key, kept.rank, deploy.walk_key'.format(
+                ', '.join('develop.' + field for field in fields)),
+            (PATH_MATCH_RANK,))
+
+        for _develop_id, develop_rows in groupby(rows, key=lambda row: row[0]):
+            resource = None
+            deployed = []
+            for row in develop_rows:
+                if resource is None:
+                    resource = OrderedDict(zip(fields, row[1:-2]))
+                deployed.append((row[-2], kinds[row[-1]]))
+            yield SqliteResult(resource, deployed)
+
+
+class SqliteResult(object):
+    """
+    A develop resource `resource` mapping and its `deployed` list of (deploy
+    path, match kind code), serialized as a TracecodeResource.
+    """
+    __slots__ = ('resource', 'deployed',)
+
+    def __init__(self, resource, deployed):
+        self.resource = resource
+        self.deployed = deployed
+
+    @property
+    def deployed_resources(self):
+        return [MatchedResource(path, *MATCH_KINDS[kind]) for path, kind in self.deployed]
+
+    def to_dict(self):
+        res = OrderedDict(self.resource)
+        res['deployed_to'] = [deployed.to_dict() for deployed in self.deployed_resources]
+        return res
+
+
+def create_tables(connection):
+    checksums = ''.join(', {} TEXT'.format(checksumtype) for checksumtype in CHECKSUM_TYPES)
+    with connection:
+        for table in ('develop', 'deploy'):
+            connection.execute(
+                'CREATE TABLE {} (id INTEGER PRIMARY KEY, path TEXT, type TEXT{}, '
+                'stem TEXT, key TEXT, walk_key BLOB)'.format(table, checksums))
+        connection.execute(
+            'CREATE TABLE matches (develop_id INTEGER, deploy_id INTEGER, rank INTEGER)')
+
+
+def create_indexes(connection):
+    with connection:
+        for checksumtype in CHECKSUM_TYPES:
+            connection.execute('CREATE INDEX deploy_{0} ON deploy ({0})'.format(checksumtype))
+        connection.execute('CREATE INDEX develop_stem ON develop (stem)')
+        connection.execute('CREATE INDEX deploy_stem ON deploy (stem, walk_key)')
+        connection.execute('CREATE INDEX develop_walk_key ON develop (walk_key)')
+
+
+def load_resources(connection, table, location):
+    """
+    Load the resources of the scan at `location` in `table` and return a
+    tuple of the path, type and checksum fields present in the scan as a
+    LeanCodebase does.
+    """
+    columns = ('path', 'type',) + CHECKSUM_TYPES + ('stem', 'key', 'walk_key',)
+    insert = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        table, ', '.join(columns), ', '.join('?' * len(columns)))
+
+    resource_fields = None
+    parent_paths = set()
+    # the walk key of directories is known once all paths are loaded
+    directories_data = {}
+    rows = []
+    with connection:
+        for data in iter_resources_data(location, columns[:-3]):
+            if resource_fields is None:
+                resource_fields = ('path', 'type',) + tuple(
+                    field for field in CHECKSUM_TYPES if field in data)
+            path = data['path']
+            parent_path = path.rstrip('/').rpartition('/')[0]
+            while parent_path and parent_path not in parent_paths:
+                parent_paths.add(parent_path)
+                parent_path = parent_path.rpartition('/')[0]
+            if (data.get('type') or 'file') == 'file':
+                rows.append(get_row(path, 'file', data, get_walk_sort_key(path, False)))
+            else:
+                directories_data[path] = data
+            if len(rows) >= BATCH_SIZE:
+                connection.executemany(insert, rows)
+                rows = []
+
+        if resource_fields is None:
+            raise Exception('Input has no file-level scan results.')
+
+        # create the missing parent directories as a VirtualCodebase does
+        for path in parent_paths.difference(directories_data):
+            directories_data[path] = {}
+        for path, data in directories_data.items():
+            walk_key = get_walk_sort_key(path, path in parent_paths)
+            rows.append(get_row(path, data.get('type') or 'directory', data, walk_key))
+        connection.executemany(insert, rows)
+
+    return resource_fields
+
+
+def get_row(path, resource_type, data, walk_key):
+    key = get_path_key(path)
+    return ((path, resource_type,)
+            + tuple(data.get(checksumtype) for checksumtype in CHECKSUM_TYPES)
+            + (key[0] if key else None, '/'.join(key), sqlite3.Binary(walk_key)))
+
+
+def insert_matches(connection, matches):
+    with connection:
+        connection.executemany(
+            'INSERT INTO matches (develop_id, deploy_id, rank) VALUES (?, ?, ?)', matches)
+
+
+def get_walk_sort_key(path, has_children):
+    """
+    Return a bytes sort key for a resource `path` such that sorting on these
+    bytes is the same as sorting on get_walk_key().
+    """
+    parts = []
+    for has_children, lowered, segment in get_walk_key(path, has_children):
+        # NUL is lower than any other character: a segment prefix of another
+        # is sorted first as with tuples
+        parts.append(b'1' if has_children else b'0')
+        parts.append(lowered.encode('utf-8') + b'\0')
+        parts.append(segment.encode('utf-8') + b'\0')
+    return b''.join(parts)
+
+
+def get_top_matches(key, candidates):
+    """
+    Return a list of the ids of the `candidates` list of (id, path key) that
+    share the longest common suffix with the `key` path key, in the same way as
+    PathIndex.match.
+    """
+    top_depth = 0
+    tops = []
+    for candidate_id, candidate_key in candidates:
+        depth = 0
+        for segment, candidate_segment in zip(key, candidate_key):
+            if segment != candidate_segment:
+                break
+            depth += 1
+        if depth > top_depth:
+            top_depth = depth
+            tops = [candidate_id]
+        elif depth == top_depth and depth:
+            tops.append(candidate_id)
+
+    # do not keep multiple matches of len 1: these are filename matches
+    # and are too weak to be valid in most cases
+    if top_depth == 1 and len(tops) > 1:
+        return []
+    return tops
@@ -0,0 +1,176 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+
+from collections import OrderedDict
+import io
+import os
+
+import simplejson
+
+from tracecode.cache import get_scan_hash
+from tracecode.codebase import LeanCodebase
+from tracecode.matchers import CHECKSUM_MATCH
+from tracecode.matchers import CHECKSUM_TYPES
+from tracecode.matchers import get_match_kind_code
+from tracecode.matchers import get_path_key
+
+
+"""
+Re-run an analysis only for the develop files affected by the changes of the
+develop and deploy scans since a previous analysis, reusing the previous
+results of all the other develop files.
+"""
+
+def get_scan_hashes(develop, deploy, develop_hash=None, deploy_hash=None):
+    """
+    Return a mapping of {"develop": hash, "deploy": hash} of the content
+    hashes of the `develop` and `deploy` scan locations, reported in the
+    output of an analysis to check that these scans are unchanged when
+    reusing it. Use the `develop_hash` and `deploy_hash` hashes if already
+    computed.
+    """
+    return OrderedDict([
+        ('develop', develop_hash or get_scan_hash(develop)),
+        ('deploy', deploy_hash or get_scan_hash(deploy)),
+    ])
+
+
+class PreviousAnalysis(object):
+    """
+    The results of a previous analysis loaded from the JSON output file at
+    `location`, and the develop and deploy scans this analysis was run on as
+    recorded in its options. These scans must be unchanged since: this is
+    checked with their content hashes reported in its "tracecode_scan_hashes"
+    section, such that only an analysis run with scan hashes can be reused.
+
+    A develop file is affected by the changes since this previous analysis if:
+    - it is new or its checksums changed,
+    - or a deploy file with one of its checksums was added, removed or changed,
+    - or a deploy file with the same base name stem was added or removed.
+    Path and checksum matches depend only on these, so the other develop files
+    have the same matches as in the previous analysis.
+    """
+
+    def __init__(self, location):
+        self.location = location
+        with io.open(location, 'rb') as previous:
+            results = simplejson.load(previous, object_pairs_hook=OrderedDict)
+
+        options = results.get('tracecode_options') or {}
+        self.develop_location = options.get('--develop')
+        self.deploy_location = options.get('--deploy')
+        scan_hashes = results.get('tracecode_scan_hashes') or {}
+        for scan, name in ((self.develop_location, 'develop'),
+                           (self.deploy_location, 'deploy')):
+            if not scan or not os.path.exists(scan):
+                raise Exception(
+                    'Scan of the previous analysis not found: {}'.format(scan))
+            scan_hash = scan_hashes.get(name)
+            if not scan_hash:
+                raise Exception(
+                    'Content hashes of the scans not found in the previous analysis: '
+                    'run it with --scan-hashes to reuse it.')
+            if scan_hash != get_scan_hash(scan):
+                raise Exception(
+                    'Scan of the previous analysis changed since: {}. '
+                    'Keep a copy of the scans of an analysis to reuse it.'.format(scan))
+
+        # mappings of {develop path: [(deploy path, match kind code)]}
+        self.checksum_matches_by_path = {}
+        self.path_matches_by_path = {}
+        for result in results.get('tracecode_results') or []:
+            for deployed in result.get('deployed_to') or []:
+                kind = get_match_kind_code(
+                    deployed['matcher'], deployed['confidence'],
+                    deployed.get('checksum_matchtype'))
+                if deployed['matcher'] == CHECKSUM_MATCH:
+                    matches_by_path = self.checksum_matches_by_path
+                else:
+                    matches_by_path = self.path_matches_by_path
+                matches_by_path.setdefault(result['path'], []).append(
+                    (deployed['path'], kind))
+
+    def get_affected_paths(self, develop_codebase, deploy_index):
+        """
+        Return a set of the paths of the `develop_codebase` files affected by
+        the changes since this previous analysis, given the `deploy_index`
+        DeployIndex of the new deploy scan.
+        """
+        previous_develop = LeanCodebase(self.develop_location, fields=CHECKSUM_TYPES)
+        previous_checksums = get_checksums_by_path(previous_develop.walk())
+
+        previous_deploy = LeanCodebase(self.deploy_location, fields=CHECKSUM_TYPES)
+        previous_deploy_checksums = get_checksums_by_path(previous_deploy.walk())
+        deploy_checksums = get_indexed_checksums_by_path(deploy_index)
+
+        # the checksums and base name stems of the changed deploy files
+        affected_checksums = set()
+        affected_stems = set()
+        for path in set(previous_deploy_checksums).symmetric_difference(deploy_checksums):
+            affected_stems.add(get_path_key(path)[:1])
+        for path in set(previous_deploy_checksums).union(deploy_checksums):
+            previous = previous_deploy_checksums.get(path, frozenset())
+            current = deploy_checksums.get(path, frozenset())
+            if previous != current:
+                affected_checksums.update(previous)
+                affected_checksums.update(current)
+
+        affected_paths = set()
+        for path, checksums in get_checksums_by_path(develop_codebase.walk()).items():
+            if (previous_checksums.get(path) != checksums
+                    or affected_checksums.intersection(checksums)
+                    or get_path_key(path)[:1] in affected_stems):
+                affected_paths.add(path)
+        return affected_paths
+
+
+def get_checksums_by_path(resources):
+    """
+    Return a mapping of {path: frozenset of (checksum type, checksum)} for
+    `resources`.
+    """
+    checksums_by_path = {}
+    for resource in resources:
+        checksums_by_path[resource.path] = frozenset(
+            (checksumtype, getattr(resource, checksumtype, None))
+            for checksumtype in CHECKSUM_TYPES
+            if getattr(resource, checksumtype, None))
+    return checksums_by_path
+
+
+def get_indexed_checksums_by_path(deploy_index):
+    """
+    Return a mapping of {path: frozenset of (checksum type, checksum)} for the
+    paths of a `deploy_index` DeployIndex.
+    """
+    checksums_by_path = dict((path, set()) for path in deploy_index.paths)
+    for checksumtype, paths_by_checksum in deploy_index.get_paths_by_checksum_by_type().items():
+        for checksum, paths in paths_by_checksum.items():
+            for path in paths:
+                checksums_by_path[path].add((checksumtype, checksum))
+    return dict((path, frozenset(checksums)) for path, checksums in checksums_by_path.items())
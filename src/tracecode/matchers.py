@@ -27,55 +27,219 @@
 from __future__ import print_function
 from __future__ import absolute_import
 
-from collections import defaultdict
+from array import array
+import binascii
+import bisect
 from collections import OrderedDict
+import multiprocessing
 
 import attr
 from commoncode.datautils import String
-from scancode.resource import VirtualCodebase
 
 from tracecode import pathutils
+from tracecode.checksums import SortedChecksums
+from tracecode.codebase import LeanCodebase
+from tracecode.progress import ProgressReporter
+from tracecode.timing import timed
 
 
 PATH_MATCH = 'path match'
 CHECKSUM_MATCH = 'checksum match'
+DIRECTORY_MATCH = 'directory match'
+JAVA_MATCH = 'java match'
 
 EXACT_CONFIDENCE = 'perfect'
 HIGH_CONFIDENCE = 'high'
 MEDIUM_CONFIDENCE = 'medium'
 LOW_CONFIDENCE = 'low'
 
+# Checksum types that can be matched in their order of precedence
+CHECKSUM_TYPES = ('sha1', 'md5', 'sha256', 'sha512')
+
+# checksum joins: with a mapping of hex checksums or a sorted-merge join of
+# binary digests that uses much less memory for very large codebases
+INDEX_JOIN = 'index'
+MERGE_JOIN = 'merge'
+
+# Minimum fraction of the files of a develop directory subtree also found in
+# the subtree of a deploy directory to pair these directories, and fraction
+# above which this is a high confidence directory match
+DIRECTORY_MIN_SIMILARITY = 0.5
+DIRECTORY_HIGH_SIMILARITY = 0.9
+
+# A develop file with more deploy files sharing its checksum or name than this
+# is too common to tell which directories are paired, such as an empty file
+DIRECTORY_MAX_CANDIDATES = 16
+
+# Sequences of directories below which the develop Java sources are laid out
+# in directories by package, from the most specific
+JAVA_SOURCE_ROOTS = (
+    ('src', 'main', 'java'),
+    ('src', 'test', 'java'),
+    ('src', 'java'),
+    ('src',),
+)
+
+# Directories below which the deploy Java classes are laid out in directories
+# by package, in addition to the directories of extracted archives such as
+# "foo.jar-extract"
+JAVA_CLASS_ROOTS = ('classes',)
+EXTRACT_SUFFIX = '-extract'
+
+# Scan fields used by each matcher in addition to the resources path and type
+FIELDS_BY_MATCHER = OrderedDict([
+    (CHECKSUM_MATCH, CHECKSUM_TYPES),
+    (PATH_MATCH, ()),
+])
+
+
+class PathTable(object):
+    """
+    A table of interned paths each identified by a small integer id.
+    """
+
+    def __init__(self, paths=()):
+        self.paths = []
+        self.ids_by_path = {}
+        for path in paths:
+            self.get_id(path)
+
+    def get_id(self, path):
+        """
+        Return the integer id of `path`, adding `path` to the table if needed.
+        """
+        path_id = self.ids_by_path.get(path)
+        if path_id is None:
+            path_id = self.ids_by_path[path] = len(self.paths)
+            self.paths.append(path)
+        return path_id
+
+    def get_path(self, path_id):
+        return self.paths[path_id]
+
+
+# List of known (matcher, confidence, checksum_matchtype) match kinds. A match
+# is stored with the small integer code of its kind: its index in this list.
+MATCH_KINDS = []
+_match_kind_codes = {}
+
+
+def get_match_kind_code(matcher, confidence, checksum_matchtype=None):
+    """
+    Return the small integer code of a match kind, registering the kind if
+    needed.
+    """
+    kind = (matcher, confidence, checksum_matchtype)
+    code = _match_kind_codes.get(kind)
+    if code is None:
+        code = _match_kind_codes[kind] = len(MATCH_KINDS)
+        MATCH_KINDS.append(kind)
+    return code
+
+
+get_match_kind_code(PATH_MATCH, HIGH_CONFIDENCE)
+for _checksumtype in CHECKSUM_TYPES:
+    get_match_kind_code(CHECKSUM_MATCH, EXACT_CONFIDENCE, _checksumtype)
+get_match_kind_code(DIRECTORY_MATCH, HIGH_CONFIDENCE)
+get_match_kind_code(DIRECTORY_MATCH, MEDIUM_CONFIDENCE)
+get_match_kind_code(JAVA_MATCH, HIGH_CONFIDENCE)
+
 
 class TracecodeResource(object):
     """
     Wrapper class to contain resource and matched resources information.
+
+    The matched deployed resources are stored compactly as two arrays of
+    deployed path ids from a shared PathTable and of match kind codes. They
+    are turned back into MatchedResource only when needed, such as when
+    serializing.
     """
+    __slots__ = (
+        'resource',
+        'path_table',
+        'deployed_path_ids',
+        'deployed_match_kinds',
+        '_positions_by_path_id',
+    )
 
-    def __init__(self, resource):
+    # build a mapping of {path id: position} to find existing matches in
+    # constant time only when there are more matches than this
+    max_scanned_matches = 16
+
+    def __init__(self, resource, path_table=None):
         # The develop resource
         self.resource = resource
-        # The targeted deployed resources
-        self.deployed_resources = []
+        # The interned deployed paths table, usually shared by all resources
+        self.path_table = path_table if path_table is not None else PathTable()
+        # The targeted deployed resources in insertion order as path ids and
+        # match kind codes
+        self.deployed_path_ids = array('L')
+        self.deployed_match_kinds = array('B')
+        self._positions_by_path_id = None
+
+    @property
+    def deployed_resources(self):
+        """
+        Return a list of the targeted deployed MatchedResource.
+        """
+        get_path = self.path_table.get_path
+        return [MatchedResource(get_path(path_id), *MATCH_KINDS[kind])
+                for path_id, kind in zip(self.deployed_path_ids, self.deployed_match_kinds)]
 
     def add_deployed_resource(self, matched_resource):
         """
-        Append the matched_resource, if the checksum result with the same path is already in the result, skip it.
+        Add the matched_resource, if the checksum result with the same path is already in the result, skip it.
+        A checksum match replaces another match with the same path in place.
         """
         if matched_resource:
-            should_append = True
-            for existing_resource in self.deployed_resources:
-                # If the checksum is matched,  skip other types of match.
-                if existing_resource.path == matched_resource.path and existing_resource.matcher == CHECKSUM_MATCH:
-                    should_append = False
-            if should_append:
-                self.deployed_resources.append(matched_resource)
+            path_id = self.path_table.get_id(matched_resource.path)
+            kind = get_match_kind_code(
+                matched_resource.matcher,
+                matched_resource.confidence,
+                matched_resource.checksum_matchtype)
+            self.add_deployed_path_id(path_id, kind)
+
+    def add_deployed_path_id(self, path_id, kind):
+        """
+        Add a match to the deployed `path_id` with the `kind` match kind code
+        with the same rules as add_deployed_resource.
+        """
+        position = self._get_position(path_id)
+        if position is not None:
+            # If the checksum is matched,  skip other types of match.
+            existing_matcher = MATCH_KINDS[self.deployed_match_kinds[position]][0]
+            if existing_matcher != CHECKSUM_MATCH and MATCH_KINDS[kind][0] == CHECKSUM_MATCH:
+                self.deployed_match_kinds[position] = kind
+            return
+
+        position = len(self.deployed_path_ids)
+        self.deployed_path_ids.append(path_id)
+        self.deployed_match_kinds.append(kind)
+
+        positions = self._positions_by_path_id
+        if positions is not None:
+            positions[path_id] = position
+        elif position >= self.max_scanned_matches:
+            self._positions_by_path_id = dict(
+                (pid, pos) for pos, pid in enumerate(self.deployed_path_ids))
+
+    def _get_position(self, path_id):
+        """
+        Return the position of the deployed `path_id` or None.
+        """
+        positions = self._positions_by_path_id
+        if positions is not None:
+            return positions.get(path_id)
+        try:
+            return self.deployed_path_ids.index(path_id)
+        except ValueError:
+            return None
 
     def to_dict(self):
         res = self.resource.to_dict()
         resources_result = []
-        if self.deployed_resources:
-            for deployed_resource in self.deployed_resources:
-                resources_result.append(deployed_resource.to_dict())
+        for deployed_resource in self.deployed_resources:
+            resources_result.append(deployed_resource.to_dict())
         res['deployed_to'] = resources_result
         return res
 
@@ -110,34 +274,309 @@ class MatchedResource(object):
         return res
 
 
+class DeployIndex(object):
+    """
+    The indexes of the deploy resources used for matching: the deploy paths
+    in walk order and interned in a PathTable, the checksums index and the
+    path suffix trie. A DeployIndex can be built once and reused for several
+    analyses against the same deploy codebase.
+
+    The checksums are indexed either in a mapping of hex checksums or, for the
+    MERGE_JOIN checksum join, in much smaller sorted arrays of binary digests.
+    """
+
+    def __init__(self, paths, paths_by_checksum_by_type=None):
+        # list of deploy paths in walk order
+        self.paths = paths
+        self.path_table = PathTable(paths)
+        # mapping of {checksum type: {checksum: [path,...]}}
+        self.paths_by_checksum_by_type = paths_by_checksum_by_type
+        # mapping of {checksum type: SortedChecksums of the path ids}
+        self.sorted_checksums_by_type = None
+        self.path_index = PathIndex(paths)
+        # mapping of {fully qualified outer class name: [class path,...]}
+        self.java_paths_by_name = None
+
+    @classmethod
+    def from_codebase(cls, codebase, checksum_join=INDEX_JOIN):
+        """
+        Return a new DeployIndex built from a deploy `codebase` with checksums
+        indexed for the `checksum_join` join.
+        """
+        paths = [resource.path for resource in codebase.walk()]
+        if checksum_join != MERGE_JOIN:
+            return cls(paths, get_checksums_index(codebase))
+
+        deploy_index = cls(paths)
+        deploy_index.sorted_checksums_by_type = get_sorted_checksums_index(
+            codebase, get_id=deploy_index.path_table.get_id)
+        return deploy_index
+
+    @classmethod
+    def from_location(cls, location, checksum_join=INDEX_JOIN):
+        """
+        Return a new DeployIndex for the deploy scan at `location`, or for an
+        already decoded deploy scan mapping.
+        """
+        codebase = LeanCodebase(location, fields=get_matchers_fields())
+        return cls.from_codebase(codebase, checksum_join=checksum_join)
+
+    def to_arrays(self):
+        """
+        Return a tuple of flat structures from which this DeployIndex can be
+        rebuilt with from_arrays: the list of deploy paths and a list of
+        (checksum type, digests, ids, others) of the sorted checksums of each
+        checksum type. These are much smaller and faster to save and load than
+        the indexes built from them.
+        """
+        sorted_checksums = [
+            (checksumtype, sc.digests, sc.ids, sc.others)
+            for checksumtype, sc in self.get_sorted_checksums_by_type().items()]
+        return self.paths, sorted_checksums
+
+    @classmethod
+    def from_arrays(cls, paths, sorted_checksums):
+        """
+        Return a new DeployIndex rebuilt from the `paths` and `sorted_checksums`
+        returned by to_arrays. The checksums mapping is built from the sorted
+        checksums only if needed.
+        """
+        deploy_index = cls(paths)
+        deploy_index.sorted_checksums_by_type = OrderedDict(
+            (checksumtype, SortedChecksums.from_arrays(checksumtype, digests, ids, others))
+            for checksumtype, digests, ids, others in sorted_checksums)
+        return deploy_index
+
+    def get_sorted_checksums_by_type(self):
+        """
+        Return a mapping of {checksum type: SortedChecksums of the path ids},
+        built from the checksums mapping if needed.
+        """
+        if self.sorted_checksums_by_type is None:
+            get_id = self.path_table.get_id
+            self.sorted_checksums_by_type = OrderedDict(
+                (checksumtype, SortedChecksums(checksumtype, (
+                    (checksum, get_id(path))
+                    for checksum, paths in paths_by_checksum.items()
+                    for path in paths)))
+                for checksumtype, paths_by_checksum in self.paths_by_checksum_by_type.items())
+        return self.sorted_checksums_by_type
+
+    def get_paths_by_checksum_by_type(self):
+        """
+        Return a mapping of {checksum type: {checksum: [path,...]}}, built from
+        the sorted checksums if needed.
+        """
+        if self.paths_by_checksum_by_type is None:
+            get_path = self.path_table.get_path
+            paths_by_checksum_by_type = OrderedDict()
+            for checksumtype, sorted_checksums in self.sorted_checksums_by_type.items():
+                paths_by_checksum = paths_by_checksum_by_type[checksumtype] = {}
+                for index, path_id in enumerate(sorted_checksums.ids):
+                    checksum = binascii.hexlify(sorted_checksums.get_digest(index)).decode('ascii')
+                    paths_by_checksum.setdefault(checksum, []).append(get_path(path_id))
+                for checksum, path_ids in sorted_checksums.others.items():
+                    paths_by_checksum[checksum] = [get_path(path_id) for path_id in path_ids]
+            self.paths_by_checksum_by_type = paths_by_checksum_by_type
+        return self.paths_by_checksum_by_type
+
+    def get_java_paths_by_name(self):
+        """
+        Return a mapping of {fully qualified outer class name: [path,...]} of
+        the deploy Java class files in walk order, built if needed. The outer
+        and inner classes of a source file have the same outer class name.
+        """
+        if self.java_paths_by_name is None:
+            java_paths_by_name = {}
+            for path in self.paths:
+                if path.endswith('.class'):
+                    for name in get_java_class_names(path):
+                        java_paths_by_name.setdefault(name, []).append(path)
+            self.java_paths_by_name = java_paths_by_name
+        return self.java_paths_by_name
+
+    def query(self, path, checksums=None):
+        """
+        Return a list of the deploy MatchedResource of a single develop file
+        with `path` and a mapping of {checksum type: checksum} `checksums`, the
+        same as its deployed_to matches in a DeploymentAnalysis: the checksum
+        matches first then the path matches.
+
+        The index is built once for the whole deploy codebase such that each
+        query is only a few lookups. For example, to find where a changed file
+        ships::
+
+            deploy_index = DeployIndex.from_location('deploy.json')
+            deploy_index.query('src/foo/bar.c', {'sha1': '...'})
+        """
+        trace_resource = TracecodeResource(None, self.path_table)
+        get_path_id = self.path_table.get_id
+        checksums = checksums or {}
+        for checksumtype, paths_by_checksum in self.get_paths_by_checksum_by_type().items():
+            checksum = checksums.get(checksumtype)
+            if not checksum:
+                continue
+            kind = get_match_kind_code(CHECKSUM_MATCH, EXACT_CONFIDENCE, checksumtype)
+            for deploy_path in paths_by_checksum.get(checksum, ()):
+                trace_resource.add_deployed_path_id(get_path_id(deploy_path), kind)
+
+        kind = get_match_kind_code(PATH_MATCH, HIGH_CONFIDENCE)
+        for deploy_path in self.path_index.match(path):
+            trace_resource.add_deployed_path_id(get_path_id(deploy_path), kind)
+        return trace_resource.deployed_resources
+
+
+class DevelopIndex(object):
+    """
+    The develop resources used for matching: the develop codebase and its
+    paths and path keys in walk order. A DevelopIndex can be built once and
+    shared by several analyses of the same develop codebase against different
+    deploy codebases.
+    """
+
+    def __init__(self, codebase):
+        self.codebase = codebase
+        # list of develop paths in walk order
+        self.paths = [resource.path for resource in codebase.walk()]
+        # list of the path keys of the develop paths, sharing their segments
+        segments = {}
+        self.path_keys = [tuple(segments.setdefault(s, s) for s in get_path_key(path))
+                          for path in self.paths]
+        # mapping of {checksum type: SortedChecksums of the walk positions}
+        self.sorted_checksums_by_type = {}
+
+    @classmethod
+    def from_location(cls, location, lean=False):
+        """
+        Return a new DevelopIndex for the develop scan at `location`. If `lean`
+        is True, load only the scan fields used by the matchers.
+        """
+        if lean:
+            codebase = LeanCodebase(location, fields=get_matchers_fields())
+        else:
+            # imported only when needed as this is slow to import
+            from scancode.resource import VirtualCodebase
+            codebase = VirtualCodebase(location)
+        return cls(codebase)
+
+    def get_sorted_checksums(self, checksumtype):
+        """
+        Return the SortedChecksums of the `checksumtype` checksums of the
+        develop resources or None.
+        """
+        if checksumtype not in self.sorted_checksums_by_type:
+            self.sorted_checksums_by_type[checksumtype] = get_sorted_checksums_index(
+                self.codebase, checksums=[checksumtype]).get(checksumtype)
+        return self.sorted_checksums_by_type[checksumtype]
+
+
 class DeploymentAnalysis(object):
     """
     A DeploymentAnalysis holds development and deployment codebases and computes
     how files on each side are related using various matching strategies.
     """
 
-    def __init__(self, develop_json_location, deploy_json_location,  options):
+    def __init__(self, develop_json_location, deploy_json_location,  options, lean=False,
+                 processes=1, deploy_index=None, progress=None, previous=None,
+                 checksum_join=INDEX_JOIN, develop_index=None, directory_match=False,
+                 java_match=False, scan_hashes=None):
         """
-        develop_json_location: The json location of the develop resources.
-        deploy_json_location: The json location of the deploy resources.
+        develop_json_location: The json location of the develop resources, or
+        the already decoded develop scan mapping.
+        deploy_json_location: The json location of the deploy resources, or
+        the already decoded deploy scan mapping.
         options: The cli options.
+        lean: If True, load only the develop scan fields used by the matchers.
+        The develop resources are then reported only with these fields.
+        processes: The number of processes to use for path matching.
+        deploy_index: An optional DeployIndex built beforehand for the deploy
+        resources, such as loaded from a cache. The deploy scan is not loaded
+        if provided.
+        progress: An optional callback function called with a Progress during
+        the checksum and path matching.
+        previous: An optional incremental.PreviousAnalysis. Only the develop
+        resources affected by changes since this previous analysis are then
+        matched, and the previous matches of the others are reused.
+        checksum_join: How to match checksums: INDEX_JOIN with a mapping of
+        the deploy checksums or MERGE_JOIN with a sorted-merge join of binary
+        digests arrays that uses much less memory.
+        develop_index: An optional DevelopIndex built beforehand for the
+        develop resources, such as shared by the analyses of several deploy
+        scans. The develop scan is not loaded if provided.
+        directory_match: If True, pair the develop and deploy directories
+        whose subtrees share most of their files, report these directory
+        matches and path match the files of a paired develop directory only
+        with the files of its deploy directories. Path matching then runs in
+        a single process. Not supported with `previous`.
+        java_match: If True, match each develop Java source file with all the
+        deploy class files of its outer and inner classes by their fully
+        qualified outer class name. The Java source files matched this way
+        are not path matched. Not supported with `previous`.
+        scan_hashes: An optional mapping of {"develop": hash, "deploy": hash}
+        of the content hashes of the scans, reported in the output such that
+        this analysis can be reused as a `previous` analysis.
         """
         self.develop = develop_json_location
         self.deploy = deploy_json_location
 
-        self.develop_codebase = VirtualCodebase(self.develop)
-        self.deploy_codebase = VirtualCodebase(self.deploy)
+        # mapping of {phase: {wall_time, cpu_time, peak_rss}}
+        self.timings = OrderedDict()
 
-        self.deploy_paths = [
-            resource.path for resource in self.deploy_codebase.walk()]
+        fields = get_matchers_fields()
+        with timed(self.timings, 'loading'):
+            if develop_index is None:
+                develop_index = DevelopIndex.from_location(self.develop, lean=lean)
+            if deploy_index is None:
+                # Only the deploy paths and checksums are ever reported
+                self.deploy_codebase = LeanCodebase(self.deploy, fields=fields)
+            else:
+                self.deploy_codebase = None
 
-        self.develop_paths = [
-            resource.path for resource in self.develop_codebase.walk()]
+        if deploy_index is None:
+            with timed(self.timings, 'indexing'):
+                deploy_index = DeployIndex.from_codebase(
+                    self.deploy_codebase, checksum_join=checksum_join)
+        self.deploy_index = deploy_index
+        self.checksum_join = checksum_join
+
+        self.develop_index = develop_index
+        self.develop_codebase = develop_index.codebase
+
+        self.deploy_paths = deploy_index.paths
+
+        self.develop_paths = develop_index.paths
+
+        # interned deploy paths shared by all the TracecodeResource
+        self.deploy_path_table = deploy_index.path_table
+
+        # suffix trie of the deploy paths, built once for all path matches
+        self.deploy_path_index = deploy_index.path_index
+
+        # path keys of the develop paths, computed once for all matchers
+        self.develop_path_keys = develop_index.path_keys
 
         self.options = options
+        self.scan_hashes = scan_hashes
+        self.processes = processes
+        self.progress = progress
         self.errors = []
 
-        # mapping of {development resource path: MatchedResource}
+        self.directory_match = directory_match
+        # DirectoryPairs computed after the checksum matching if requested
+        self.directory_pairs = None
+        self.java_match = java_match
+        # set of the develop paths matched by the Java matcher
+        self.java_matched_paths = set()
+
+        self.previous = previous
+        # set of the develop paths to match or None to match all of them
+        self.affected_paths = None
+        if previous:
+            with timed(self.timings, 'diffing'):
+                self.affected_paths = previous.get_affected_paths(
+                    self.develop_codebase, deploy_index)
+
+        # mapping of {development resource path: TracecodeResource}
         # FIXME: do we really need an OrderedDict?
         self.analysed_result = OrderedDict()
 
@@ -147,41 +586,108 @@ class DeploymentAnalysis(object):
         """
         Compute (or re-compute) the analysis, and store results.
         """
-        self.checksum_match()
+        with timed(self.timings, 'checksum_matching'):
+            self.checksum_match()
+        if self.java_match:
+            with timed(self.timings, 'java_matching'):
+                self.java_class_match()
+        if self.directory_match:
+            with timed(self.timings, 'directory_matching'):
+                self.directory_pairs_match()
         # The path match should be after checksum match, since if checksum is
         # matched, the result of path match will be ignored
-        self.path_match()
+        with timed(self.timings, 'path_matching'):
+            self.path_match()
 
     def path_match(self):
         """
         Path matching for the develop and deploy resources.
         """
+        affected_paths = self.affected_paths
+        java_matched_paths = self.java_matched_paths
+        develop_paths = self.develop_paths
+        develop_path_keys = self.develop_path_keys
+        if affected_paths is not None or java_matched_paths:
+            affected = [(path, key) for path, key in zip(develop_paths, develop_path_keys)
+                        if (affected_paths is None or path in affected_paths)
+                        and path not in java_matched_paths]
+            develop_paths = [path for path, _key in affected]
+            develop_path_keys = [key for _path, key in affected]
+
+        if self.processes > 1 and not self.directory_pairs:
+            matched_deploy_paths_by_develop_path = match_paths_in_parallel(
+                develop_path_keys, self.deploy_path_index, self.processes)
+        else:
+            if self.directory_pairs:
+                match = self.directory_pairs.match
+            else:
+                match = self.deploy_path_index.match
+            matched_deploy_paths_by_develop_path = (
+                match(develop_path, key)
+                for develop_path, key in zip(develop_paths, develop_path_keys))
+
+        path_kind = get_match_kind_code(PATH_MATCH, HIGH_CONFIDENCE)
+        get_path_id = self.deploy_path_table.get_id
+        reporter = ProgressReporter(self.progress, 'path matching', len(self.develop_paths))
+
+        # develop_paths are in the develop codebase walk order
+        processed = 0
         for develop_resource in self.develop_codebase.walk():
-            develop_path = develop_resource.path
+            if develop_resource.path in java_matched_paths:
+                matches = ()
+            elif affected_paths is None or develop_resource.path in affected_paths:
+                matches = ((matched_deploy_path, path_kind) for matched_deploy_path
+                           in next(matched_deploy_paths_by_develop_path))
+            else:
+                matches = self.previous.path_matches_by_path.get(develop_resource.path, ())
 
-            for matched_deploy_path in match_paths(develop_path, self.deploy_paths):
-                matched_deploy_resource = MatchedResource(
-                    matched_deploy_path, PATH_MATCH, HIGH_CONFIDENCE)
+            for matched_deploy_path, kind in matches:
                 trace_resource_develop_based = self.create_or_get_traceresource_by_resource(
                     develop_resource)
-                trace_resource_develop_based.add_deployed_resource(
-                    matched_deploy_resource)
+                trace_resource_develop_based.add_deployed_path_id(
+                    get_path_id(matched_deploy_path), kind)
+
+            processed += 1
+            if processed == reporter.next_check:
+                reporter.update(processed, len(self.analysed_result))
+
+        # release the path matching worker processes if any
+        matched_deploy_paths_by_develop_path.close()
+        reporter.finish(len(self.analysed_result))
 
     def checksum_match(self):
         """
-        Compare the sha1 and md5 of the develop and deploy resources, and get
+        Compare the checksums of the develop and deploy resources, and get
         the matched paths list which has the same checksum between develop and deploy
         resources, using the paths list, create matched resource and add it the result.
+
+        All the checksum types are indexed in a single walk of the deploy
+        codebase and matched in a single walk of the develop codebase. The
+        checksum types are tried in the CHECKSUM_TYPES order of precedence.
         """
-        checksums = ['sha1',  'md5']
+        if self.checksum_join == MERGE_JOIN:
+            return self.checksum_merge_join()
+
+        deploy_paths_by_checksum_by_type = self.deploy_index.get_paths_by_checksum_by_type()
+        kinds = dict((checksumtype, get_match_kind_code(CHECKSUM_MATCH, EXACT_CONFIDENCE, checksumtype))
+                     for checksumtype in deploy_paths_by_checksum_by_type)
+        get_path_id = self.deploy_path_table.get_id
+        reporter = ProgressReporter(self.progress, 'checksum matching', len(self.develop_paths))
+        affected_paths = self.affected_paths
+
+        processed = 0
+        for develop_resource in self.develop_codebase.walk():
+            processed += 1
+            if processed == reporter.next_check:
+                reporter.update(processed, len(self.analysed_result))
 
-        for checksumtype in checksums:
-            deploy_paths_by_checksum = get_checksum_index(
-                self.deploy_codebase, checksumtype)
+            if affected_paths is not None and develop_resource.path not in affected_paths:
+                self.reuse_previous_checksum_matches(develop_resource)
+                continue
 
-            for develop_resource in self.develop_codebase.walk():
+            for checksumtype, deploy_paths_by_checksum in deploy_paths_by_checksum_by_type.items():
                 develop_resource_checksum = getattr(
-                    develop_resource, checksumtype)
+                    develop_resource, checksumtype, None)
                 if not develop_resource_checksum:
                     continue
 
@@ -190,13 +696,122 @@ class DeploymentAnalysis(object):
                 if not deploy_paths:
                     continue   # If the checksum is not found in the index, skip
 
+                trace_resource_develop_based = self.create_or_get_traceresource_by_resource(
+                    develop_resource)
+                kind = kinds[checksumtype]
                 for deploy_path in deploy_paths:
-                    matched_deploy_resource = MatchedResource(
-                        deploy_path, CHECKSUM_MATCH, EXACT_CONFIDENCE, checksumtype)
-                    trace_resource_develop_based = self.create_or_get_traceresource_by_resource(
-                        develop_resource)
-                    trace_resource_develop_based.add_deployed_resource(
-                        matched_deploy_resource)
+                    trace_resource_develop_based.add_deployed_path_id(
+                        get_path_id(deploy_path), kind)
+
+        reporter.finish(len(self.analysed_result))
+
+    def checksum_merge_join(self):
+        """
+        Match checksums as checksum_match does, with a sorted-merge join of the
+        develop and deploy checksums as binary digests arrays for each
+        checksum type. The results are the same.
+        """
+        develop_codebase = self.develop_codebase
+        # list of [ChecksumsJoin of the develop walk positions, cursor, match
+        # kind] for each checksum type in order of precedence
+        joins = []
+        for checksumtype, deploy_checksums in self.deploy_index.get_sorted_checksums_by_type().items():
+            develop_checksums = self.develop_index.get_sorted_checksums(checksumtype)
+            if develop_checksums:
+                kind = get_match_kind_code(CHECKSUM_MATCH, EXACT_CONFIDENCE, checksumtype)
+                joins.append([deploy_checksums.join(develop_checksums), 0, kind])
+
+        reporter = ProgressReporter(self.progress, 'checksum matching', len(self.develop_paths))
+        affected_paths = self.affected_paths
+
+        for position, develop_resource in enumerate(develop_codebase.walk()):
+            if position + 1 == reporter.next_check:
+                reporter.update(position + 1, len(self.analysed_result))
+
+            reuse_previous = (affected_paths is not None
+                              and develop_resource.path not in affected_paths)
+
+            for join in joins:
+                checksums_join, cursor, kind = join
+                positions = checksums_join.other_ids
+                # the joined develop positions are sorted as walked
+                while cursor < len(positions) and positions[cursor] < position:
+                    cursor += 1
+                join[1] = cursor
+                if reuse_previous or cursor == len(positions) or positions[cursor] != position:
+                    continue
+                trace_resource_develop_based = self.create_or_get_traceresource_by_resource(
+                    develop_resource)
+                path_ids = checksums_join.ids
+                for index in range(checksums_join.starts[cursor], checksums_join.ends[cursor]):
+                    trace_resource_develop_based.add_deployed_path_id(path_ids[index], kind)
+
+            if reuse_previous:
+                self.reuse_previous_checksum_matches(develop_resource)
+
+        reporter.finish(len(self.analysed_result))
+
+    def java_class_match(self):
+        """
+        Match each develop Java source file with the deploy class files of its
+        outer and inner classes using a single index lookup of its fully
+        qualified outer class name, rather than a path suffix match.
+        """
+        java_paths_by_name = self.deploy_index.get_java_paths_by_name()
+        kind = get_match_kind_code(JAVA_MATCH, HIGH_CONFIDENCE)
+        get_path_id = self.deploy_path_table.get_id
+        for develop_resource in self.develop_codebase.walk():
+            develop_path = develop_resource.path
+            if not develop_path.endswith('.java') or not develop_resource.is_file:
+                continue
+            for name in get_java_source_names(develop_path):
+                deploy_paths = java_paths_by_name.get(name)
+                if not deploy_paths:
+                    continue
+                trace_resource_develop_based = self.create_or_get_traceresource_by_resource(
+                    develop_resource)
+                for deploy_path in deploy_paths:
+                    trace_resource_develop_based.add_deployed_path_id(
+                        get_path_id(deploy_path), kind)
+                self.java_matched_paths.add(develop_path)
+                break
+
+    def directory_pairs_match(self):
+        """
+        Pair the develop and deploy directories whose subtrees share most of
+        their files, using the checksum matches, and add a directory match for
+        each pair.
+        """
+        self.directory_pairs = pairs = DirectoryPairs(self)
+        kinds = {
+            True: get_match_kind_code(DIRECTORY_MATCH, HIGH_CONFIDENCE),
+            False: get_match_kind_code(DIRECTORY_MATCH, MEDIUM_CONFIDENCE),
+        }
+        get_path_id = self.deploy_path_table.get_id
+        for develop_resource in self.develop_codebase.walk():
+            deploy_dirs = pairs.deploy_dirs_by_develop_dir.get(develop_resource.path)
+            if not deploy_dirs:
+                continue
+            trace_resource_develop_based = self.create_or_get_traceresource_by_resource(
+                develop_resource)
+            for deploy_dir, similarity in deploy_dirs:
+                kind = kinds[similarity >= DIRECTORY_HIGH_SIMILARITY]
+                trace_resource_develop_based.add_deployed_path_id(get_path_id(deploy_dir), kind)
+
+    def reuse_previous_checksum_matches(self, develop_resource):
+        """
+        Add the checksum matches of `develop_resource` from the previous
+        analysis.
+        """
+        previous_matches = self.previous.checksum_matches_by_path.get(develop_resource.path)
+        if not previous_matches:
+            return
+        get_path_id = self.deploy_path_table.get_id
+        trace_resource_develop_based = self.create_or_get_traceresource_by_resource(
+            develop_resource)
+        for deploy_path, kind in previous_matches:
+            trace_resource_develop_based.add_deployed_path_id(
+                get_path_id(deploy_path), kind)
 
     def create_or_get_traceresource_by_resource(self, resource):
         """
@@ -207,7 +822,7 @@ class DeploymentAnalysis(object):
         if self.analysed_result.get(path):
             trace_resource = self.analysed_result.get(path)
         else:
-            trace_resource = TracecodeResource(resource)
+            trace_resource = TracecodeResource(resource, self.deploy_path_table)
             self.analysed_result[path] = trace_resource
         return trace_resource
 
@@ -217,28 +832,306 @@ class DeploymentAnalysis(object):
         If the trace_resource has the matched resource, append to the result
         stored for the class.
         """
-        if trace_resource.deployed_resources:
+        if trace_resource.deployed_path_ids:
             self.analysed_result[trace_resource.resource.path] = trace_resource
 
 
+class DirectoryPairs(object):
+    """
+    The pairs of develop and deploy directories whose subtrees share a high
+    fraction of files of a DeploymentAnalysis `analysis`, computed after its
+    checksum matching.
+
+    Each develop file votes for the pairs of its ancestor directories and of
+    the same level ancestors of the deploy files it is related to: the files
+    with one of its checksums, or otherwise the files with the same base name
+    stem. A develop directory is paired with the deploy directories that got
+    the most votes if these are at least DIRECTORY_MIN_SIMILARITY of the files
+    of its subtree.
+
+    The files of a paired develop directory are then path matched only with
+    the files of the deploy directories paired with their closest paired
+    ancestor, unless none of these has the same base name stem. The paired
+    develop directories themselves are not path matched.
+    """
+
+    # number of stems mappings of paired deploy directories kept
+    max_paths_by_stem = 64
+
+    def __init__(self, analysis, min_similarity=DIRECTORY_MIN_SIMILARITY,
+                 max_candidates=DIRECTORY_MAX_CANDIDATES):
+        self.deploy_index = deploy_index = analysis.deploy_index
+        # mapping of {develop directory: [(deploy directory, similarity),...]}
+        self.deploy_dirs_by_develop_dir = {}
+        # mapping of {tuple of deploy directories: {stem: [(path, key),...]}}
+        # of the paths and path keys in these directories from the least to
+        # the most recently used
+        self.paths_by_stem_by_dirs = OrderedDict()
+        # the deploy paths sorted such that the paths below a directory are
+        # contiguous, sorted only when needed
+        self.sorted_paths = None
+
+        get_path = deploy_index.path_table.get_path
+        stem_nodes = deploy_index.path_index.root.children
+        deploy_dirs = set(parent for path in deploy_index.paths
+                          for parent in get_parent_paths(path)[:1])
+
+        # mapping of {(develop directory, deploy directory): votes}
+        votes = {}
+        # mapping of {develop directory: number of files of its subtree}
+        files_counts = {}
+        for develop_resource, key in zip(analysis.develop_codebase.walk(),
+                                         analysis.develop_path_keys):
+            if not develop_resource.is_file:
+                continue
+            develop_path = develop_resource.path
+            develop_parents = get_parent_paths(develop_path)
+            for develop_dir in develop_parents:
+                files_counts[develop_dir] = files_counts.get(develop_dir, 0) + 1
+
+            candidates = []
+            trace_resource = analysis.analysed_result.get(develop_path)
+            if trace_resource:
+                candidates = [get_path(path_id) for path_id, kind in zip(
+                    trace_resource.deployed_path_ids, trace_resource.deployed_match_kinds)
+                    if MATCH_KINDS[kind][0] == CHECKSUM_MATCH]
+            stem_node = not candidates and key and stem_nodes.get(key[0])
+            # the count of a stem node includes the directories with this stem
+            if stem_node and stem_node.count <= max_candidates:
+                candidates = [path for _order, path in stem_node.get_paths()
+                              if path not in deploy_dirs]
+            if not candidates or len(candidates) > max_candidates:
+                continue
+
+            pairs = set()
+            for deploy_path in candidates:
+                pairs.update(zip(develop_parents, get_parent_paths(deploy_path)))
+            for pair in pairs:
+                votes[pair] = votes.get(pair, 0) + 1
+
+        best_by_develop_dir = {}
+        for (develop_dir, deploy_dir), count in votes.items():
+            similarity = count / float(files_counts[develop_dir])
+            if similarity < min_similarity:
+                continue
+            best = best_by_develop_dir.get(develop_dir)
+            if not best or similarity > best[0][1]:
+                best_by_develop_dir[develop_dir] = [(deploy_dir, similarity)]
+            elif similarity == best[0][1]:
+                best.append((deploy_dir, similarity))
+
+        get_path_id = deploy_index.path_table.get_id
+        for develop_dir, best in best_by_develop_dir.items():
+            # in the deploy walk order
+            best.sort(key=lambda pair: get_path_id(pair[0]))
+            self.deploy_dirs_by_develop_dir[develop_dir] = best
+
+    def get_paths_by_stem(self, deploy_dirs):
+        """
+        Return a mapping of {base name stem: [(path, path key),...]} of the
+        deploy paths in the `deploy_dirs` deploy directories in walk order,
+        with their path keys interned as in the PathIndex. The mappings of
+        the most recently used directories are kept: the develop files of a
+        directory come together in a walk.
+        """
+        paths_by_stem_by_dirs = self.paths_by_stem_by_dirs
+        paths_by_stem = paths_by_stem_by_dirs.pop(deploy_dirs, None)
+        if paths_by_stem is None:
+            if self.sorted_paths is None:
+                self.sorted_paths = sorted(self.deploy_index.paths)
+            sorted_paths = self.sorted_paths
+            paths = []
+            for deploy_dir in deploy_dirs:
+                # the paths below a directory are a range of the sorted paths
+                start = bisect.bisect_left(sorted_paths, deploy_dir + '/')
+                end = bisect.bisect_left(sorted_paths, deploy_dir + '0', lo=start)
+                paths.extend(sorted_paths[start:end])
+            paths.sort(key=self.deploy_index.path_table.get_id)
+
+            get_key = self.deploy_index.path_index.get_key
+            paths_by_stem = {}
+            for path in paths:
+                key = get_key(path)
+                if key:
+                    paths_by_stem.setdefault(key[0], []).append((path, key))
+            if len(paths_by_stem_by_dirs) >= self.max_paths_by_stem:
+                paths_by_stem_by_dirs.popitem(last=False)
+        paths_by_stem_by_dirs[deploy_dirs] = paths_by_stem
+        return paths_by_stem
+
+    def match(self, path, key=None):
+        """
+        Return the top deploy paths matching the develop `path` on the longest
+        common path suffix as PathIndex.match does, only among the files of
+        the deploy directories paired with the closest paired ancestor of
+        `path` if any has the same base name stem.
+        """
+        if path in self.deploy_dirs_by_develop_dir:
+            # the directory matches of a paired directory replace its path matches
+            return []
+        path_index = self.deploy_index.path_index
+        if key is None:
+            key = path_index.get_key(path)
+        if not key:
+            return []
+
+        for develop_dir in get_parent_paths(path):
+            deploy_dirs = self.deploy_dirs_by_develop_dir.get(develop_dir)
+            if deploy_dirs:
+                candidates = self.get_paths_by_stem(tuple(
+                    deploy_dir for deploy_dir, _similarity in deploy_dirs)).get(key[0])
+                if candidates:
+                    break
+        else:
+            return list(path_index.match(path, key))
+
+        if len(candidates) == 1:
+            return [candidates[0][0]]
+        depths = [get_common_depth(key, candidate_key) for _, candidate_key in candidates]
+        top_depth = max(depths)
+        # do not keep multiple matches of len 1 as PathIndex.match does
+        if top_depth == 1:
+            return []
+        return [candidate for (candidate, _), depth in zip(candidates, depths)
+                if depth == top_depth]
+
+
+def get_common_depth(key1, key2):
+    """
+    Return the number of leading segments shared by the `key1` and `key2`
+    path keys. For example:
+    >>> get_common_depth(('test', 'src', 'foo'), ('test', 'src', 'bar'))
+    2
+    """
+    depth = 0
+    for segment1, segment2 in zip(key1, key2):
+        if segment1 != segment2:
+            break
+        depth += 1
+    return depth
+
+
+def get_java_source_names(path):
+    """
+    Return a list of the candidate fully qualified class names of the Java
+    source file at `path`: one for each JAVA_SOURCE_ROOTS directory in `path`,
+    from the outermost. For example:
+    >>> get_java_source_names('app/src/main/java/com/acme/Foo.java')
+    ['com.acme.Foo']
+    >>> get_java_source_names('src/org/src/Foo.java')
+    ['org.src.Foo', 'Foo']
+    """
+    segments = pathutils.split(path)
+    if not segments or not segments[-1].endswith('.java'):
+        return []
+    dirs = segments[:-1]
+    class_name = segments[-1][:-len('.java')]
+    names = []
+    for start in range(len(dirs)):
+        for root in JAVA_SOURCE_ROOTS:
+            end = start + len(root)
+            if tuple(dirs[start:end]) == root:
+                names.append('.'.join(dirs[end:] + [class_name]))
+                break
+    return names
+
+
+def get_java_class_names(path):
+    """
+    Return a list of the candidate fully qualified outer class names of the
+    Java class file at `path`: one for each JAVA_CLASS_ROOTS or extracted
+    archive directory in `path`, from the outermost. For example:
+    >>> get_java_class_names('foo.jar-extract/com/acme/Foo$Inner$1.class')
+    ['com.acme.Foo']
+    >>> get_java_class_names('app.war-extract/WEB-INF/classes/Foo.class')
+    ['WEB-INF.classes.Foo', 'Foo']
+    """
+    segments = pathutils.split(path)
+    if not segments or not segments[-1].endswith('.class'):
+        return []
+    dirs = segments[:-1]
+    class_name = segments[-1][:-len('.class')].split('$', 1)[0]
+    if not class_name:
+        return []
+    return ['.'.join(dirs[position + 1:] + [class_name])
+            for position, segment in enumerate(dirs)
+            if segment in JAVA_CLASS_ROOTS or segment.endswith(EXTRACT_SUFFIX)]
+
+
+def get_parent_paths(path):
+    """
+    Return a list of the paths of the parent directories of `path` from its
+    parent up to its top-level directory. For example:
+    >>> get_parent_paths('samples/src/test.java')
+    ['samples/src', 'samples']
+    """
+    segments = pathutils.split(path)
+    return ['/'.join(segments[:end]) for end in range(len(segments) - 1, 0, -1)]
+
+
+def get_matchers_fields(matchers=tuple(FIELDS_BY_MATCHER)):
+    """
+    Return a list of the scan fields used by the `matchers`.
+    """
+    fields = []
+    for matcher in matchers:
+        for field in FIELDS_BY_MATCHER[matcher]:
+            if field not in fields:
+                fields.append(field)
+    return fields
+
+
 def get_checksum_index(codebase, checksum='sha1'):
     """
     Return a mapping index of {checksum: [path,...]} for a `codebase`.
     """
+    return get_checksums_index(codebase, checksums=[checksum]).get(checksum, {})
+
+
+def get_checksums_index(codebase, checksums=CHECKSUM_TYPES):
+    """
+    Return a mapping index of {checksum type: {checksum: [path,...]}} for a
+    `codebase` built in a single walk for all the `checksums` types. Only the
+    checksum types present in the `codebase` are included, in the `checksums`
+    order.
+    """
     # TODO: we could also handle empty SHA1... BUT that should be something
     # dealt with by Scancode instead
-    paths_by_checksum = {}
+    paths_by_checksum_by_type = OrderedDict(
+        (checksumtype, {}) for checksumtype in checksums)
 
     for resource in codebase.walk():
-        resource_checksum = getattr(resource, checksum)
-        if not resource_checksum:
-            continue
-        paths = paths_by_checksum.get(resource_checksum)
-        if paths:
-            paths_by_checksum.get(resource_checksum).append(resource.path)
-        else:
-            paths_by_checksum[resource_checksum] = [resource.path]
-    return paths_by_checksum
+        for checksumtype, paths_by_checksum in paths_by_checksum_by_type.items():
+            resource_checksum = getattr(resource, checksumtype, None)
+            if not resource_checksum:
+                continue
+            paths = paths_by_checksum.get(resource_checksum)
+            if paths:
+                paths.append(resource.path)
+            else:
+                paths_by_checksum[resource_checksum] = [resource.path]
+
+    return OrderedDict((checksumtype, paths_by_checksum)
+                       for checksumtype, paths_by_checksum in paths_by_checksum_by_type.items()
+                       if paths_by_checksum)
+
+
+def get_sorted_checksums_index(codebase, get_id=None, checksums=CHECKSUM_TYPES):
+    """
+    Return a mapping of {checksum type: SortedChecksums} for a `codebase`
+    with the walk order position of each resource as id, or the id returned by
+    `get_id(path)` if provided. Only the checksum types present in the
+    `codebase` are included, in the `checksums` order.
+    """
+    sorted_checksums_by_type = OrderedDict()
+    for checksumtype in checksums:
+        checksums_and_ids = (
+            (getattr(resource, checksumtype, None), get_id(resource.path) if get_id else position)
+            for position, resource in enumerate(codebase.walk()))
+        sorted_checksums = SortedChecksums(checksumtype, checksums_and_ids)
+        if len(sorted_checksums):
+            sorted_checksums_by_type[checksumtype] = sorted_checksums
+    return sorted_checksums_by_type
 
 
 def remove_file_suffix(path):
@@ -256,25 +1149,177 @@ def remove_file_suffix(path):
     return path
 
 
+def get_path_key(path):
+    """
+    Return a path key for `path` used for path matching: a tuple of the path
+    segments in reverse order with the file suffix removed from the last
+    segment. For example:
+    >>> get_path_key('/home/test/src/test.java')
+    ('test', 'src', 'test', 'home')
+    """
+    return tuple(reversed(pathutils.split(remove_file_suffix(path))))
+
+
+@attr.s(slots=True)
+class PathNode(object):
+    """
+    A node of a PathIndex suffix trie.
+    """
+    # mapping of {path segment: child PathNode}
+    children = attr.ib(default=attr.Factory(dict))
+    # list of (insertion order, path) for the paths ending at this node
+    paths = attr.ib(default=attr.Factory(list))
+    # number of paths ending at this node or below
+    count = attr.ib(default=0)
+
+    def get_paths(self):
+        """
+        Return a list of (insertion order, path) for the paths ending at this
+        node or below.
+        """
+        paths = []
+        nodes = [self]
+        while nodes:
+            node = nodes.pop()
+            paths.extend(node.paths)
+            nodes.extend(node.children.values())
+        return paths
+
+
+class PathIndex(object):
+    """
+    A suffix trie of paths keyed on reversed path segments. The paths that share
+    the longest common path suffix with a query path are found with a single
+    walk down the trie rather than comparing the query with every path.
+
+    Paths are normalized once with get_path_key when added such that for
+    instance a develop "foo/bar.java" can match a deployed "foo/bar.class".
+
+    The first level of the trie is an inverted index of the base name stems
+    of the paths: a query is only ever compared with the paths that share its
+    stem, and a query with a stem that is not indexed is rejected with a single
+    lookup.
+    """
+
+    def __init__(self, paths=()):
+        self.root = PathNode()
+        self.paths_count = 0
+        # mapping of {segment: segment} to intern the segments of the paths
+        self.segments = {}
+        for path in paths:
+            self.add(path)
+
+    def get_key(self, path, add=False):
+        """
+        Return the path key of `path` with its segments interned with the
+        segments of the indexed paths. New segments are added to this index
+        only if `add` is True.
+        """
+        segments = self.segments
+        if add:
+            intern_segment = lambda s: segments.setdefault(s, s)
+        else:
+            intern_segment = lambda s: segments.get(s, s)
+        return tuple(intern_segment(s) for s in get_path_key(path))
+
+    def add(self, path):
+        """
+        Add `path` to the index.
+        """
+        key = self.get_key(path, add=True)
+        if not key:
+            return
+
+        node = self.root
+        nodes = [node]
+        for segment in key:
+            child = node.children.get(segment)
+            if child is None:
+                child = node.children[segment] = PathNode()
+            node = child
+            nodes.append(node)
+
+        if any(existing == path for _, existing in node.paths):
+            return
+
+        node.paths.append((self.paths_count, path))
+        self.paths_count += 1
+        for node in nodes:
+            node.count += 1
+
+    def match(self, path, key=None):
+        """
+        Yield the top indexed paths matching `path` on the longest common path
+        suffix, in the order they were added. Use the `key` path key of `path`
+        if provided rather than computing it again.
+        """
+        if key is None:
+            key = get_path_key(path)
+
+        node = self.root
+        depth = 0
+        for segment in key:
+            child = node.children.get(segment)
+            if child is None:
+                break
+            node = child
+            depth += 1
+
+        if not depth:
+            return
+
+        # do not keep multiple matches of len 1: these are filename matches
+        # and are too weak to be valid in most cases
+        if depth == 1 and node.count > 1:
+            return
+
+        for _order, top in sorted(node.get_paths()):
+            yield top
+
+
 def match_paths(path1, paths2):
     """
     Given a single path1 and a sequences of paths paths2, match path1 with paths in
     paths2 using a common suffix. Yield a sequences of the top matched paths from path2
+
+    paths2 can also be a PathIndex built beforehand: this is much faster when
+    matching many paths against the same paths2.
     """
-    cp1 = defaultdict(set)
+    key = get_path_key(path1)
+    if not isinstance(paths2, PathIndex):
+        # only the paths with the same base name stem can match: index only these
+        stem = key[:1]
+        paths2 = PathIndex(path for path in paths2 if get_path_key(path)[:1] == stem)
 
-    path1_remove_filesuffix = remove_file_suffix(path1)
-    for p2 in paths2:
-        path2_remove_filesuffix = remove_file_suffix(p2)
-        cmn, lgth = pathutils.common_path_suffix(
-            path1_remove_filesuffix, path2_remove_filesuffix)
-        if cmn:
-            cp1[lgth].add(p2)
+    for top in paths2.match(path1, key):
+        yield top
 
-    if cp1:
-        tops = cp1[max(cp1)]
-        # do not keep multiple matches of len 1: these are filename matches
-        # and are too weak to be valid in most cases
-        if not (max(cp1) == 1 and len(tops) > 1):
-            for top in tops:
-                yield top
+
+# The PathIndex of a path matching worker process, set once for each worker
+_worker_path_index = None
+
+
+def _init_path_match_worker(path_index):
+    global _worker_path_index
+    _worker_path_index = path_index
+
+
+def _match_path_in_worker(key):
+    return list(_worker_path_index.match(None, key))
+
+
+def match_paths_in_parallel(keys1, path_index, processes):
+    """
+    Yield the lists of top matched paths from the `path_index` PathIndex for
+    each path key of `keys1` in the same order, computed using a pool of
+    `processes` processes. The `path_index` is sent once to each process.
+    """
+    pool = multiprocessing.Pool(
+        processes, initializer=_init_path_match_worker, initargs=(path_index,))
+    try:
+        chunksize = max(1, len(keys1) // (processes * 4))
+        for matched in pool.imap(_match_path_in_worker, keys1, chunksize=chunksize):
+            yield matched
+    finally:
+        pool.close()
+        pool.join()
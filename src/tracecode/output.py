@@ -0,0 +1,157 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+
+from collections import OrderedDict
+import io
+
+import simplejson
+
+from tracecode import __version__
+from tracecode.timing import timed
+from tracecode.utils import get_notice
+
+
+"""
+Write the results of a TraceCode analysis as JSON or JSON Lines.
+"""
+
+
+def write_json(analysis, outfile, compact=False, timing=False):
+    """
+    Write the data from the `analysis` DeploymentAnalysis as JSON to `outfile`.
+
+    Each result is serialized and written on its own as soon as it is
+    reached, such that the whole JSON document is never built in memory. If
+    `compact` is True, write JSON without indentation. If `timing` is True,
+    end the JSON with a "tracecode_timings" section with the time and memory
+    used by each analysis phase, including this serialization.
+    """
+    write = get_writer(outfile)
+    headers = get_headers(analysis)
+
+    if compact:
+        dump_kwargs = dict(iterable_as_array=True, separators=(',', ':'))
+    else:
+        dump_kwargs = dict(iterable_as_array=True, indent=2)
+
+    with timed(analysis.timings, 'serialization'):
+        # strip the closing brace to append the results to the headers
+        headers = simplejson.dumps(headers, **dump_kwargs).rstrip()[:-1].rstrip()
+        write(headers)
+        write(',"tracecode_results":[' if compact else ',\n  "tracecode_results": [')
+
+        has_results = False
+        for trace_resource in analysis.analysed_result.values():
+            result = simplejson.dumps(trace_resource.to_dict(), **dump_kwargs)
+            if has_results:
+                write(',')
+            if not compact:
+                result = '\n' + '\n'.join('    ' + line for line in result.splitlines())
+            write(result)
+            has_results = True
+
+        if compact:
+            write(']')
+        else:
+            write('\n  ]' if has_results else ']')
+
+    # the timings come last to include the serialization
+    if timing:
+        timings = simplejson.dumps(analysis.timings, **dump_kwargs)
+        if compact:
+            write(',"tracecode_timings":' + timings)
+        else:
+            write(',\n  "tracecode_timings": ' + timings.replace('\n', '\n  '))
+
+    write('}\n' if compact else '\n}\n')
+
+
+def write_jsonl(analysis, outfile, timing=False):
+    """
+    Write the data from the `analysis` DeploymentAnalysis as JSON Lines to
+    `outfile`: a first line with the headers followed by one line for each
+    develop resource result. Each line is written as soon as it is serialized.
+    If `timing` is True, end with a {"tracecode_timings": ...} line with the
+    time and memory used by each analysis phase, including this serialization.
+    """
+    write = get_writer(outfile)
+    dump_kwargs = dict(iterable_as_array=True, separators=(',', ':'))
+
+    with timed(analysis.timings, 'serialization'):
+        write(simplejson.dumps(get_headers(analysis), **dump_kwargs))
+        write('\n')
+        for trace_resource in analysis.analysed_result.values():
+            write(simplejson.dumps(trace_resource.to_dict(), **dump_kwargs))
+            write('\n')
+
+    if timing:
+        timings = OrderedDict([('tracecode_timings', analysis.timings)])
+        write(simplejson.dumps(timings, **dump_kwargs))
+        write('\n')
+
+
+def get_query_result(path, deployed_to):
+    """
+    Return a mapping of the `deployed_to` list of MatchedResource of a single
+    develop `path` query.
+    """
+    return OrderedDict([
+        ('path', path),
+        ('deployed_to', [matched.to_dict() for matched in deployed_to]),
+    ])
+
+
+def get_headers(analysis):
+    """
+    Return a mapping of the output headers for the `analysis`
+    DeploymentAnalysis.
+    """
+    headers = OrderedDict([
+        ('tracecode_notice', get_notice()),
+        ('tracecode_options', analysis.options),
+    ])
+    if analysis.scan_hashes:
+        headers['tracecode_scan_hashes'] = analysis.scan_hashes
+    headers['tracecode_version'] = __version__
+    headers['tracecode_errors'] = analysis.errors
+    return headers
+
+
+def get_writer(outfile):
+    """
+    Return a function to write text to `outfile` opened either in text or
+    binary mode.
+    """
+    if isinstance(outfile, io.TextIOBase):
+        return outfile.write
+
+    def write(text):
+        if not isinstance(text, bytes):
+            text = text.encode('utf-8')
+        outfile.write(text)
+    return write
@@ -0,0 +1,178 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+from __future__ import division
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import cProfile
+from timeit import default_timer as timer
+
+from tracecode import pathutils
+
+
+"""
+Profile an analysis with cProfile and count the calls and the work done by
+the matching functions.
+"""
+
+
+class MatchingCounters(object):
+    """
+    Count the calls, the time spent and the work done by the matching functions
+    while enabled. The functions are wrapped only when enabled such that there
+    is no overhead otherwise.
+
+    Only the calls made in this process are counted: path matching done in
+    worker processes is not.
+    """
+
+    def __init__(self):
+        # mapping of {function name: {counter name: value}}
+        self.counters = OrderedDict()
+
+    def get_counter(self, name, *extra_counts):
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = OrderedDict([('calls', 0), ('time', 0.0)])
+            for count in extra_counts:
+                counter[count] = 0
+            self.counters[name] = counter
+        return counter
+
+    @contextmanager
+    def enabled(self):
+        """
+        Context manager to count the calls to the matching functions in its
+        block.
+        """
+        # imported here as the matchers are only imported when needed
+        from tracecode import matchers
+
+        patched = [
+            (matchers.PathIndex, 'match', self.wrap_path_index_match),
+            (matchers.TracecodeResource, 'add_deployed_path_id', self.wrap_add_deployed_path_id),
+            (matchers, 'remove_file_suffix', self.wrap_remove_file_suffix),
+            (pathutils, 'split', self.wrap_function),
+        ]
+        originals = []
+        for owner, name, wrapper in patched:
+            original = owner.__dict__[name]
+            originals.append((owner, name, original))
+            setattr(owner, name, wrapper(original))
+        try:
+            yield self
+        finally:
+            for owner, name, original in originals:
+                setattr(owner, name, original)
+
+    def wrap_function(self, func):
+        counter = self.get_counter(func.__name__)
+
+        def wrapper(*args, **kwargs):
+            start = timer()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                counter['calls'] += 1
+                counter['time'] += timer() - start
+        return wrapper
+
+    def wrap_path_index_match(self, match):
+        # matched are the paths returned and stem_candidates are the indexed
+        # paths with the same base name stem as the query: the only paths the
+        # trie walk can reach. The other indexed paths are never compared.
+        counter = self.get_counter('match_paths', 'matched', 'stem_candidates')
+
+        # imported here as the matchers are only imported when needed
+        from tracecode.matchers import get_path_key
+
+        def wrapper(path_index, path, key=None):
+            start = timer()
+            if key is None:
+                key = get_path_key(path)
+            matched = list(match(path_index, path, key))
+            counter['calls'] += 1
+            counter['time'] += timer() - start
+            counter['matched'] += len(matched)
+            stem_node = key and path_index.root.children.get(key[0])
+            if stem_node:
+                counter['stem_candidates'] += stem_node.count
+            return iter(matched)
+        return wrapper
+
+    def wrap_add_deployed_path_id(self, add_deployed_path_id):
+        # skipped are the other matches to an already matched deploy path
+        counter = self.get_counter('add_deployed_resource', 'added', 'skipped')
+
+        def wrapper(trace_resource, path_id, kind):
+            start = timer()
+            count = len(trace_resource.deployed_path_ids)
+            add_deployed_path_id(trace_resource, path_id, kind)
+            counter['calls'] += 1
+            counter['time'] += timer() - start
+            if len(trace_resource.deployed_path_ids) > count:
+                counter['added'] += 1
+            else:
+                counter['skipped'] += 1
+        return wrapper
+
+    def wrap_remove_file_suffix(self, remove_file_suffix):
+        counter = self.get_counter('remove_file_suffix', 'stripped')
+
+        def wrapper(path):
+            start = timer()
+            stripped = remove_file_suffix(path)
+            counter['calls'] += 1
+            counter['time'] += timer() - start
+            if stripped != path:
+                counter['stripped'] += 1
+            return stripped
+        return wrapper
+
+
+@contextmanager
+def profiled(stats_location=None, counters=None):
+    """
+    Context manager to profile its block with cProfile and save the pstats
+    statistics to the `stats_location` file if provided, and to count the calls
+    to the matching functions with the `counters` MatchingCounters if provided.
+    """
+    profiler = None
+    if stats_location:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        if counters:
+            with counters.enabled():
+                yield
+        else:
+            yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(stats_location)
@@ -0,0 +1,128 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+from __future__ import division
+
+from timeit import default_timer as timer
+
+import attr
+
+
+"""
+Report the progress of the long-running phases of an analysis to a callback.
+"""
+
+# minimum number of seconds between two progress reports
+REPORT_INTERVAL = 0.5
+
+# number of processed files between two checks of the time since the last report
+CHECK_STEP = 256
+
+
+@attr.s(slots=True)
+class Progress(object):
+    """
+    The progress of an analysis phase as reported to a progress callback.
+    """
+    # name of the phase such as "checksum matching"
+    phase = attr.ib()
+    # number of develop files to process in this phase
+    total = attr.ib()
+    # number of develop files processed so far in this phase
+    processed = attr.ib(default=0)
+    # number of develop files with matches found so far
+    matches = attr.ib(default=0)
+    # seconds since the start of this phase
+    elapsed = attr.ib(default=0.0)
+
+    @property
+    def throughput(self):
+        """
+        Return the number of develop files processed per second.
+        """
+        if not self.elapsed:
+            return 0.0
+        return self.processed / self.elapsed
+
+    @property
+    def eta(self):
+        """
+        Return the estimated number of seconds until the end of this phase or
+        None if not known yet.
+        """
+        throughput = self.throughput
+        if not throughput:
+            return None
+        return (self.total - self.processed) / throughput
+
+
+class ProgressReporter(object):
+    """
+    Report the Progress of a `phase` processing `total` develop files to a
+    `callback` function called with a Progress.
+
+    The processing loop should call update() only when the processed count
+    reaches `next_check`: this keeps the loop overhead to a comparison. The
+    callback is then called at most once every `interval` seconds. Nothing is
+    ever reported if `callback` is None.
+    """
+
+    def __init__(self, callback, phase, total, interval=REPORT_INTERVAL, step=CHECK_STEP):
+        self.callback = callback
+        self.progress = Progress(phase=phase, total=total)
+        self.interval = interval
+        self.step = step
+        self.start = self.last_report = timer()
+        # processed count at which to call update() next: never if no callback
+        self.next_check = step if callback else -1
+        if callback:
+            callback(self.progress)
+
+    def update(self, processed, matches):
+        """
+        Report the `processed` and `matches` counts if the last report is older
+        than the interval.
+        """
+        self.next_check = processed + self.step
+        now = timer()
+        if now - self.last_report >= self.interval:
+            self._report(processed, matches, now)
+
+    def finish(self, matches):
+        """
+        Report the end of this phase with `matches`.
+        """
+        if self.callback:
+            self._report(self.progress.total, matches, timer())
+
+    def _report(self, processed, matches, now):
+        self.last_report = now
+        progress = self.progress
+        progress.processed = processed
+        progress.matches = matches
+        progress.elapsed = now - self.start
+        self.callback(progress)
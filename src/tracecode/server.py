@@ -0,0 +1,266 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import io
+import os
+import traceback
+
+try:
+    from http.server import BaseHTTPRequestHandler
+    from http.server import HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler
+    from BaseHTTPServer import HTTPServer
+
+import simplejson
+
+from tracecode.matchers import DeployIndex
+from tracecode.matchers import DeploymentAnalysis
+from tracecode.matchers import DevelopIndex
+from tracecode.output import get_query_result
+from tracecode.output import write_json
+from tracecode.utils import string_types
+from tracecode.utils import validate_scan
+
+
+"""
+A long-lived local HTTP server for TraceCode analyses. The indexes of the
+recently used develop and deploy scans stay loaded in memory in an LRU cache,
+such that repeated analyses and single-path queries against the same scans
+skip loading and indexing them.
+
+The server has no authentication and reads any scan file path a request names
+and returns its contents: it only ever listens on the loopback interface.
+"""
+
+
+class IndexCache(object):
+    """
+    An LRU cache of loaded DevelopIndex and DeployIndex keyed by scan file
+    location. An index is reloaded when its scan file changes. The least
+    recently used indexes are evicted when the total size of their scan files,
+    used as an approximation of their memory cost, exceeds `max_size` bytes.
+    The most recently used index is always kept, even if larger.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        # mapping of {(kind, location, lean): (stat, size, index)} from the
+        # least to the most recently used
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_develop_index(self, location, lean=False):
+        """
+        Return a DevelopIndex for the develop scan at `location`.
+        """
+        return self._get('develop', location, lean)
+
+    def get_deploy_index(self, location):
+        """
+        Return a DeployIndex for the deploy scan at `location`.
+        """
+        return self._get('deploy', location, False)
+
+    def _get(self, kind, location, lean):
+        location = os.path.abspath(location)
+        key = kind, location, lean
+        stat = os.stat(location)
+        stat = stat.st_mtime, stat.st_size
+
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+            if entry[0] == stat:
+                self.hits += 1
+                self._add(key, entry)
+                return entry[2]
+
+        self.misses += 1
+        index = load_index(kind, location, lean)
+        self._add(key, (stat, stat[1], index))
+        return index
+
+    def _add(self, key, entry):
+        self.entries[key] = entry
+        self.size += entry[1]
+        while self.size > self.max_size and len(self.entries) > 1:
+            _key, (_stat, size, _index) = self.entries.popitem(last=False)
+            self.size -= size
+
+    def to_dict(self):
+        res = OrderedDict()
+        res['max_size'] = self.max_size
+        res['size'] = self.size
+        res['hits'] = self.hits
+        res['misses'] = self.misses
+        res['entries'] = [OrderedDict([('kind', kind), ('location', location),
+                                       ('lean', lean), ('size', size)])
+                          for (kind, location, lean), (_stat, size, _index)
+                          in self.entries.items()]
+        return res
+
+
+def load_index(kind, location, lean=False):
+    """
+    Return a new DevelopIndex or DeployIndex for the `kind` scan at
+    `location`. Raise a ValueError if this is not a valid JSON scan.
+    """
+    scan = validate_scan(location)
+    if not scan:
+        raise ValueError('{} path is not a json file: {}'.format(kind.title(), location))
+    if kind == 'develop':
+        return DevelopIndex.from_location(scan, lean=lean)
+    return DeployIndex.from_location(scan)
+
+
+class TracecodeRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handle the JSON requests to a TracecodeServer:
+
+    - POST /analyze with a {"develop": location, "deploy": location} object
+      and optional "lean", "compact" and "timing" flags returns the same JSON
+      as the tracecode command with the --lean, --compact and --timing options.
+    - POST /query with a {"deploy": location, "path": develop path} object
+      and an optional {checksum type: checksum} "checksums" object returns the
+      {"path": path, "deployed_to": [...]} matches of this develop file.
+    - GET /status returns the state of the indexes cache.
+
+    A failed request returns an {"error": message} object with a 400 status
+    for a malformed request or a scan that cannot be read, and a 500 status
+    for any other error such as a scan without file results.
+    """
+
+    def do_GET(self):
+        if self.path != '/status':
+            return self.send_error(404)
+        self.send_json(self.server.cache.to_dict())
+
+    def do_POST(self):
+        handler = {
+            '/analyze': self.analyze,
+            '/query': self.query,
+        }.get(self.path)
+        if not handler:
+            return self.send_error(404)
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            request = simplejson.loads(self.rfile.read(length).decode('utf-8'))
+            if not isinstance(request, dict):
+                raise ValueError('The request is not a JSON object')
+            handler(request)
+        except (KeyError, ValueError, EnvironmentError) as e:
+            self.send_json({'error': '{}: {}'.format(e.__class__.__name__, e)}, status=400)
+        except Exception as e:
+            self.log_error('%s', traceback.format_exc())
+            self.send_json({'error': '{}: {}'.format(e.__class__.__name__, e)}, status=500)
+
+    def analyze(self, request):
+        develop = get_string(request, 'develop')
+        deploy = get_string(request, 'deploy')
+        lean = bool(request.get('lean'))
+        options = OrderedDict([
+            ('--develop', develop),
+            ('--deploy', deploy),
+        ])
+        if lean:
+            options['--lean'] = lean
+
+        cache = self.server.cache
+        develop_index = cache.get_develop_index(develop, lean=lean)
+        deploy_index = cache.get_deploy_index(deploy)
+        analysis = DeploymentAnalysis(
+            develop_json_location=develop, deploy_json_location=deploy,
+            options=options, lean=lean, deploy_index=deploy_index,
+            develop_index=develop_index)
+
+        output = io.BytesIO()
+        write_json(analysis, output, compact=bool(request.get('compact')),
+                   timing=bool(request.get('timing')))
+        self.send_body(output.getvalue())
+
+    def query(self, request):
+        deploy_index = self.server.cache.get_deploy_index(get_string(request, 'deploy'))
+        path = get_string(request, 'path')
+        checksums = request.get('checksums')
+        if checksums is not None and not isinstance(checksums, dict):
+            raise ValueError('"checksums" is not a JSON object')
+        deployed_to = deploy_index.query(path, checksums)
+        self.send_json(get_query_result(path, deployed_to))
+
+    def send_json(self, data, status=200):
+        self.send_body(simplejson.dumps(data).encode('utf-8'), status=status)
+
+    def send_body(self, body, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # NOQA
+        if not self.server.quiet:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+def get_string(request, key):
+    """
+    Return the string value of `key` in the `request` mapping. Raise a KeyError
+    if missing or a ValueError if this is not a string.
+    """
+    value = request[key]
+    if not isinstance(value, string_types):
+        raise ValueError('"{}" is not a JSON string'.format(key))
+    return value
+
+
+class TracecodeServer(HTTPServer):
+    """
+    An HTTP server handling one request at a time with an IndexCache of the
+    loaded scans indexes shared by all requests.
+    """
+
+    def __init__(self, server_address, cache_size, quiet=False):
+        HTTPServer.__init__(self, server_address, TracecodeRequestHandler)
+        self.cache = IndexCache(cache_size)
+        self.quiet = quiet
+
+
+def make_server(port=8765, cache_size=1024 * 1024 * 1024, quiet=False):
+    """
+    Return a new TracecodeServer listening on `port` of the loopback
+    interface with an indexes cache of `cache_size` bytes. Use port 0 to pick
+    a free port.
+    """
+    return TracecodeServer(('127.0.0.1', port), cache_size=cache_size, quiet=quiet)
@@ -0,0 +1,100 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+from __future__ import division
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import os
+import sys
+from timeit import default_timer as timer
+
+try:
+    # not available on Windows
+    import resource
+except ImportError:
+    resource = None
+
+
+"""
+Measure the wall time, CPU time and peak memory of the phases of an analysis.
+"""
+
+
+def get_cpu_time():
+    """
+    Return the user and system CPU time in seconds used by this process and
+    its terminated child processes such as path matching workers.
+    """
+    if resource is None:
+        times = os.times()
+        return times[0] + times[1] + times[2] + times[3]
+    cpu_time = 0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        cpu_time += usage.ru_utime + usage.ru_stime
+    return cpu_time
+
+
+def get_peak_rss():
+    """
+    Return the peak resident set size in bytes of this process so far or None
+    if this is not available on this platform.
+    """
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # this is in bytes on macOS and in kilobytes on Linux and other Unixes
+    if sys.platform != 'darwin':
+        peak_rss *= 1024
+    return peak_rss
+
+
+@contextmanager
+def timed(timings, phase):
+    """
+    Context manager to measure the execution of its block and store it in the
+    `timings` mapping under the `phase` key as a mapping of wall time and CPU
+    time in seconds and peak RSS in bytes at the end of the phase. The times of
+    a phase measured more than once are added up.
+    """
+    start_wall = timer()
+    start_cpu = get_cpu_time()
+    try:
+        yield
+    finally:
+        wall_time = timer() - start_wall
+        cpu_time = get_cpu_time() - start_cpu
+        previous = timings.get(phase)
+        if previous:
+            wall_time += previous['wall_time']
+            cpu_time += previous['cpu_time']
+        timings[phase] = OrderedDict([
+            ('wall_time', round(wall_time, 6)),
+            ('cpu_time', round(cpu_time, 6)),
+            ('peak_rss', get_peak_rss()),
+        ])
@@ -26,11 +26,26 @@
 from __future__ import absolute_import
 from __future__ import division
 
+from collections import OrderedDict
+import io
 import os
 
 import simplejson
 from commoncode import filetype
-from commoncode import fileutils
+
+try:
+    # Python 2
+    string_types = basestring  # NOQA
+except NameError:
+    # Python 3
+    string_types = str
+
+try:
+    # optional: used to validate large scans without loading them
+    import ijson
+    import ijson.common
+except ImportError:
+    ijson = None
 
 
 def get_notice():
@@ -67,3 +82,56 @@ def is_json_path(location):
         except:
             return False
     return False
+
+
+def validate_scan(location):
+    """
+    Return the JSON scan at `location` in a form suitable to load it as a
+    codebase, or None if this is not a valid JSON scan.
+
+    If the optional ijson library is installed, only the start of the scan up
+    to the first item of its "files" array is decoded and `location` is
+    returned. Otherwise the whole scan is decoded and returned as a mapping so
+    that it is never decoded twice.
+    """
+    if not filetype.is_file(location):
+        return None
+
+    if ijson:
+        if is_scan_header(location):
+            return location
+        return None
+
+    try:
+        # read as bytes such that the scan is decoded as UTF-8 whatever the
+        # locale encoding
+        with io.open(location, 'rb') as jsonfile:
+            scan = simplejson.load(jsonfile, object_pairs_hook=OrderedDict)
+    except (ValueError, EnvironmentError):
+        # simplejson.JSONDecodeError and UnicodeDecodeError are ValueError
+        return None
+    if isinstance(scan, dict) and isinstance(scan.get('files'), list):
+        return scan
+
+
+def is_scan_header(location):
+    """
+    Test if the input location file starts like a JSON scan: a JSON object
+    with a "files" array of objects. Only decode the start of the file. This
+    requires the optional ijson library.
+    """
+    try:
+        with io.open(location, 'rb') as scan:
+            events = ijson.parse(scan)
+            _prefix, event, _value = next(events)
+            if event != 'start_map':
+                return False
+            for prefix, event, _value in events:
+                if prefix == 'files':
+                    if event != 'start_array':
+                        return False
+                    _prefix, event, _value = next(events)
+                    return event in ('start_map', 'end_array')
+    except (ijson.common.JSONError, StopIteration, ValueError, EnvironmentError):
+        return False
+    return False
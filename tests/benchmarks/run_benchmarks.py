@@ -0,0 +1,200 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+from datetime import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from timeit import default_timer as timer
+
+import click
+
+from tracecode import __version__
+from tracecode.output import write_json
+from tracecode.codebase import LeanCodebase
+from tracecode.matchers import DeploymentAnalysis
+from tracecode.matchers import get_checksum_index
+from tracecode.matchers import get_matchers_fields
+from tracecode.matchers import match_paths
+from tracecode.matchers import PathIndex
+
+sys.path.insert(0, os.path.dirname(__file__))
+from synthetic import generate_scans  # NOQA
+
+
+"""
+Benchmark the TraceCode matching engine on synthetic scans and record the
+timings in a JSON Lines file to catch performance regressions across releases.
+
+For example:
+    python tests/benchmarks/run_benchmarks.py --files 10000 --results bench.jsonl
+"""
+
+# a timing is reported as a regression if this much slower than the previous run
+REGRESSION_RATIO = 1.2
+
+# timings shorter than this are too noisy to be compared
+MIN_SECONDS = 0.05
+
+
+def run_benchmarks(develop_json, deploy_json, repeat=1):
+    """
+    Return a mapping of {benchmark name: best time in seconds} running each
+    benchmark `repeat` times on the `develop_json` and `deploy_json` scans.
+    """
+    def best_of(func):
+        times = []
+        for _ in range(repeat):
+            start = timer()
+            func()
+            times.append(timer() - start)
+        return min(times)
+
+    timings = OrderedDict()
+    timings['DeploymentAnalysis'] = best_of(
+        lambda: DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict()))
+
+    analysis = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict())
+    deploy_codebase = LeanCodebase(deploy_json, fields=get_matchers_fields())
+
+    timings['get_checksum_index'] = best_of(
+        lambda: get_checksum_index(deploy_codebase, 'sha1'))
+
+    timings['PathIndex'] = best_of(lambda: PathIndex(analysis.deploy_paths))
+
+    path_index = analysis.deploy_path_index
+
+    def match_all_paths():
+        for develop_path in analysis.develop_paths:
+            for _ in match_paths(develop_path, path_index):
+                pass
+    timings['match_paths'] = best_of(match_all_paths)
+
+    def write_results():
+        with tempfile.TemporaryFile(mode='w+b') as out:
+            write_json(analysis, out)
+    timings['write_json'] = best_of(write_results)
+
+    return timings
+
+
+def load_previous_run(results_location, parameters):
+    """
+    Return the last recorded run with the same `parameters` from the JSON
+    Lines `results_location` file or None.
+    """
+    if not results_location or not os.path.exists(results_location):
+        return None
+    previous = None
+    with io.open(results_location, encoding='utf-8') as results:
+        for line in results:
+            line = line.strip()
+            if not line:
+                continue
+            run = json.loads(line, object_pairs_hook=OrderedDict)
+            if run.get('parameters') == parameters:
+                previous = run
+    return previous
+
+
+def get_regressions(timings, previous_timings, ratio=REGRESSION_RATIO):
+    """
+    Return a list of the benchmark names whose `timings` are slower than the
+    `previous_timings` by more than `ratio`.
+    """
+    return [name for name, seconds in timings.items()
+            if previous_timings.get(name) and seconds > MIN_SECONDS
+            and seconds > previous_timings[name] * ratio]
+
+
+@click.command()
+@click.option('--files', default=1000, show_default=True, help='Number of files of the develop scan.')
+@click.option('--depth', default=4, show_default=True, help='Maximum depth of the directories.')
+@click.option('--duplicates', default=0.1, show_default=True, help='Ratio of files with the same checksum.')
+@click.option('--java', default=0.3, show_default=True, help='Ratio of .java files deployed as .class files.')
+@click.option('--repeat', default=3, show_default=True, help='Number of runs of each benchmark. The best is kept.')
+@click.option('--results', default=None, type=click.Path(dir_okay=False),
+              help='Path of a .jsonl file where to append the results and compare with previous runs.')
+@click.help_option('-h', '--help')
+def cli(files, depth, duplicates, java, repeat, results):
+    """
+    Benchmark TraceCode on synthetic develop and deploy scans.
+    """
+    parameters = OrderedDict([
+        ('files', files),
+        ('depth', depth),
+        ('duplicates', duplicates),
+        ('java', java),
+    ])
+
+    test_dir = tempfile.mkdtemp(prefix='tracecode-benchmark-')
+    try:
+        develop_json = os.path.join(test_dir, 'develop.json')
+        deploy_json = os.path.join(test_dir, 'deploy.json')
+        generate_scans(develop_json, deploy_json, files_count=files, depth=depth,
+                       duplicates_ratio=duplicates, java_ratio=java)
+        timings = run_benchmarks(develop_json, deploy_json, repeat=repeat)
+    finally:
+        shutil.rmtree(test_dir, ignore_errors=True)
+
+    previous = load_previous_run(results, parameters)
+    regressions = previous and get_regressions(timings, previous['timings']) or []
+    for name, seconds in timings.items():
+        line = '{:<20} {:>10.4f}s'.format(name, seconds)
+        if previous and previous['timings'].get(name):
+            line += '  (previous: {:.4f}s)'.format(previous['timings'][name])
+        if name in regressions:
+            line += '  REGRESSION'
+        click.echo(line)
+
+    if results:
+        run = OrderedDict([
+            ('date', datetime.utcnow().isoformat()),
+            ('tracecode_version', __version__),
+            ('python_version', platform.python_version()),
+            ('parameters', parameters),
+            ('timings', timings),
+        ])
+        with io.open(results, 'ab') as out:
+            out.write(json.dumps(run).encode('utf-8'))
+            out.write(b'\n')
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    cli()
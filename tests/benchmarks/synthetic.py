@@ -0,0 +1,137 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import hashlib
+import io
+import json
+import random
+
+
+"""
+Generate synthetic pairs of develop and deploy ScanCode JSON scans to
+benchmark TraceCode.
+"""
+
+
+def generate_scans(develop_location, deploy_location, files_count=1000, depth=4,
+                   duplicates_ratio=0.1, java_ratio=0.3, seed=0):
+    """
+    Write a pair of synthetic develop and deploy ScanCode JSON scans at
+    `develop_location` and `deploy_location`:
+
+    - the develop scan has `files_count` files in directories nested up to
+      `depth` levels below "src/main/java" or "src".
+    - a `java_ratio` fraction of the files are .java files deployed as .class
+      files with other checksums under "classes", to be found by path match.
+    - other files are deployed as-is under "lib", to be found by checksum match.
+    - a `duplicates_ratio` fraction of the files have the same content, such
+      as the LICENSE or empty files of real codebases.
+    """
+    rand = random.Random(seed)
+    develop_files = []
+    deploy_files = []
+
+    for i in range(files_count):
+        dirs = ['pkg{}'.format(rand.randint(0, 9)) for _ in range(rand.randint(1, depth))]
+        if rand.random() < duplicates_ratio:
+            content = 'duplicated content'
+        else:
+            content = 'content {}'.format(i)
+
+        if rand.random() < java_ratio:
+            name = 'File{}'.format(i)
+            develop_path = '/'.join(['develop', 'src', 'main', 'java'] + dirs + [name + '.java'])
+            deploy_path = '/'.join(['deploy', 'classes'] + dirs + [name + '.class'])
+            deploy_content = 'compiled ' + content
+        else:
+            name = 'file{}.txt'.format(i)
+            develop_path = '/'.join(['develop', 'src'] + dirs + [name])
+            deploy_path = '/'.join(['deploy', 'lib'] + dirs + [name])
+            deploy_content = content
+
+        develop_files.append(get_file_data(develop_path, content))
+        deploy_files.append(get_file_data(deploy_path, deploy_content))
+
+    write_scan(develop_location, develop_files)
+    write_scan(deploy_location, deploy_files)
+
+
+def get_file_data(path, content):
+    """
+    Return a mapping of ScanCode file data for a file at `path` with `content`.
+    """
+    content = content.encode('utf-8')
+    return OrderedDict([
+        ('path', path),
+        ('type', 'file'),
+        ('name', path.rpartition('/')[-1]),
+        ('size', len(content)),
+        ('sha1', hashlib.sha1(content).hexdigest()),
+        ('md5', hashlib.md5(content).hexdigest()),
+        ('licenses', []),
+        ('copyrights', []),
+        ('scan_errors', []),
+    ])
+
+
+def write_scan(location, files):
+    """
+    Write a ScanCode JSON scan at `location` with the `files` file data and
+    their parent directories.
+    """
+    dirs = set()
+    for file_data in files:
+        parent = file_data['path'].rpartition('/')[0]
+        while parent and parent not in dirs:
+            dirs.add(parent)
+            parent = parent.rpartition('/')[0]
+
+    resources = [OrderedDict([('path', path), ('type', 'directory'),
+                              ('name', path.rpartition('/')[-1]), ('size', 0),
+                              ('sha1', None), ('md5', None), ('licenses', []),
+                              ('copyrights', []), ('scan_errors', [])])
+                 for path in dirs]
+    resources.extend(files)
+    resources.sort(key=lambda r: r['path'])
+
+    scan = OrderedDict([
+        ('headers', [OrderedDict([
+            ('tool_name', 'scancode-toolkit'),
+            ('tool_version', '3.1.1'),
+            ('options', {'input': ['synthetic']}),
+            ('errors', []),
+            ('extra_data', {'files_count': len(files)}),
+        ])]),
+        ('files', resources),
+    ])
+    with io.open(location, 'wb') as out:
+        out.write(json.dumps(scan, indent=2, separators=(',', ': ')).encode('utf-8'))
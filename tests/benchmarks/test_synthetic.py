@@ -0,0 +1,79 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import os
+
+from commoncode.testcase import FileBasedTesting
+
+from tracecode.matchers import DeploymentAnalysis
+
+from run_benchmarks import get_regressions
+from run_benchmarks import run_benchmarks
+from synthetic import generate_scans
+
+
+class TestSynthetic(FileBasedTesting):
+
+    def test_generate_scans_are_matched(self):
+        test_dir = self.get_temp_dir()
+        develop_json = os.path.join(test_dir, 'develop.json')
+        deploy_json = os.path.join(test_dir, 'deploy.json')
+        generate_scans(develop_json, deploy_json, files_count=20, java_ratio=0.5)
+
+        da = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict())
+        results = [tr.to_dict() for tr in da.analysed_result.values()]
+        matched = dict((r['path'], [d['path'] for d in r['deployed_to']]) for r in results)
+
+        java_paths = [p for p in matched if p.endswith('.java')]
+        assert java_paths
+        for path in java_paths:
+            expected = path.replace('develop/src/main/java/', 'deploy/classes/')
+            assert expected[:-len('.java')] + '.class' in matched[path]
+
+        text_paths = [p for p in matched if p.endswith('.txt')]
+        assert text_paths
+        for path in text_paths:
+            assert path.replace('develop/src/', 'deploy/lib/') in matched[path]
+
+    def test_run_benchmarks(self):
+        test_dir = self.get_temp_dir()
+        develop_json = os.path.join(test_dir, 'develop.json')
+        deploy_json = os.path.join(test_dir, 'deploy.json')
+        generate_scans(develop_json, deploy_json, files_count=10)
+        timings = run_benchmarks(develop_json, deploy_json)
+        assert ['DeploymentAnalysis', 'get_checksum_index', 'PathIndex',
+                'match_paths', 'write_json'] == list(timings)
+
+    def test_get_regressions(self):
+        timings = OrderedDict([('a', 1.0), ('b', 2.0), ('c', 0.01)])
+        previous = OrderedDict([('a', 1.0), ('b', 1.0), ('c', 0.001)])
+        assert ['b'] == get_regressions(timings, previous)
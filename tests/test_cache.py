@@ -0,0 +1,115 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import os
+import shutil
+
+from commoncode.testcase import FileBasedTesting
+from testing_utils import check_json_scan
+from testing_utils import run_scan_click
+
+from tracecode import cache
+from tracecode.matchers import DeploymentAnalysis
+from tracecode.matchers import MERGE_JOIN
+from tracecode.output import write_json
+
+
+class TestCache(FileBasedTesting):
+
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+    def test_save_and_load_deploy_index(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        expected_file = self.get_test_loc('cli/basic/expected.json')
+        cache_dir = self.get_temp_dir()
+        deploy_hash = cache.get_scan_hash(deploy_json)
+
+        assert cache.load_deploy_index(cache_dir, deploy_hash) is None
+        da = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict())
+        cache.save_deploy_index(cache_dir, deploy_hash, da.deploy_index)
+
+        deploy_index = cache.load_deploy_index(cache_dir, deploy_hash)
+        assert da.deploy_index.paths == deploy_index.paths
+        assert (da.deploy_index.get_paths_by_checksum_by_type()
+                == deploy_index.get_paths_by_checksum_by_type())
+
+        # the deploy scan is not loaded at all with a deploy_index
+        da = DeploymentAnalysis(develop_json, 'not-loaded.json', options=OrderedDict(),
+                                deploy_index=deploy_index)
+        assert da.deploy_codebase is None
+        result_file = self.get_temp_file('json')
+        with open(result_file, 'w') as rfile:
+            write_json(analysis=da, outfile=rfile)
+        check_json_scan(expected_file, result_file, regen=False)
+
+    def test_cached_deploy_index_with_merge_join(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        expected_file = self.get_test_loc('cli/basic/expected.json')
+        cache_dir = self.get_temp_dir()
+
+        da = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict())
+        cache.save_deploy_index(cache_dir, 'hash', da.deploy_index)
+        deploy_index = cache.load_deploy_index(cache_dir, 'hash')
+        # only the flat arrays are cached: the checksums mapping is not built
+        assert deploy_index.paths_by_checksum_by_type is None
+
+        da = DeploymentAnalysis(develop_json, 'not-loaded.json', options=OrderedDict(),
+                                deploy_index=deploy_index, checksum_join=MERGE_JOIN)
+        result_file = self.get_temp_file('json')
+        with open(result_file, 'w') as rfile:
+            write_json(analysis=da, outfile=rfile)
+        check_json_scan(expected_file, result_file, regen=False)
+
+    def test_scan_hash_changes_with_content(self):
+        test_dir = self.get_temp_dir()
+        deploy_json = os.path.join(test_dir, 'deploy.json')
+        shutil.copy(self.get_test_loc('cli/basic/deploy.json'), deploy_json)
+        deploy_hash = cache.get_scan_hash(deploy_json)
+        with open(deploy_json, 'a') as deploy:
+            deploy.write('\n')
+        assert deploy_hash != cache.get_scan_hash(deploy_json)
+
+    def test_cli_with_index_cache(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        expected_json = self.get_test_loc('cli/basic/expected.json')
+        cache_dir = os.path.join(self.get_temp_dir(), 'cache')
+
+        for _ in range(2):
+            result_file = self.get_temp_file('json')
+            args = ['--develop', develop_json, '--deploy', deploy_json,
+                    '--index-cache', cache_dir, '-j', result_file]
+            run_scan_click(args)
+            check_json_scan(expected_json, result_file, regen=False)
+            assert 1 == len(os.listdir(cache_dir))
@@ -0,0 +1,96 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from array import array
+from collections import OrderedDict
+import os
+
+from commoncode.testcase import FileBasedTesting
+
+from tracecode import checksums
+from tracecode.checksums import SortedChecksums
+from tracecode.matchers import DeploymentAnalysis
+from tracecode.matchers import MERGE_JOIN
+
+
+class TestChecksums(FileBasedTesting):
+
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+    def check_join(self):
+        deploy = SortedChecksums('md5', [
+            ('bb' * 16, 0), ('aa' * 16, 1), ('bb' * 16, 2), (None, 3), ('not-hex', 4)])
+        develop = SortedChecksums('md5', [
+            ('bb' * 16, 10), ('cc' * 16, 11), ('not-hex', 12), ('bb' * 16, 13)])
+        assert 4 == len(deploy)
+        checksums_join = deploy.join(develop)
+        results = [(other_id, list(ids)) for other_id, ids in checksums_join]
+        assert [(10, [0, 2]), (12, [4]), (13, [0, 2])] == results
+        assert array('L', [10, 12, 13]) == checksums_join.other_ids
+
+    def test_sorted_checksums_join(self):
+        self.check_join()
+
+    def test_sorted_checksums_join_without_numpy(self):
+        numpy = checksums.numpy
+        checksums.numpy = None
+        try:
+            self.check_join()
+        finally:
+            checksums.numpy = numpy
+
+    def test_get_digest_ignores_checksums_not_in_lowercase_hex(self):
+        assert b'\xab' * 16 == checksums.get_digest('ab' * 16, 16)
+        assert None is checksums.get_digest('AB' * 16, 16)
+        assert None is checksums.get_digest('ab' * 15, 16)
+        assert None is checksums.get_digest('zz' * 16, 16)
+
+    def test_merge_join_is_the_same_as_index_join(self):
+        for scans in ('cli/basic', 'matchers/class'):
+            develop_json = self.get_test_loc(scans + '/develop.json')
+            deploy_json = self.get_test_loc(scans + '/deploy.json')
+            expected = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict())
+            results = DeploymentAnalysis(
+                develop_json, deploy_json, options=OrderedDict(), checksum_join=MERGE_JOIN)
+            assert ([tr.to_dict() for tr in expected.analysed_result.values()]
+                    == [tr.to_dict() for tr in results.analysed_result.values()])
+
+    def test_deploy_index_checksums_conversions(self):
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        index = DeploymentAnalysis(develop_json, deploy_json, options={}).deploy_index
+        merge = DeploymentAnalysis(
+            develop_json, deploy_json, options={}, checksum_join=MERGE_JOIN).deploy_index
+        assert index.paths_by_checksum_by_type == merge.get_paths_by_checksum_by_type()
+        converted = index.get_sorted_checksums_by_type()
+        for checksumtype, sorted_checksums in merge.sorted_checksums_by_type.items():
+            assert sorted_checksums.digests == converted[checksumtype].digests
+            assert sorted_checksums.ids == converted[checksumtype].ids
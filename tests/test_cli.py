@@ -28,7 +28,13 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+from collections import OrderedDict
+import io
+import json
 import os
+import pstats
+import subprocess
+import sys
 
 from click.testing import CliRunner
 
@@ -36,6 +42,7 @@ from commoncode.testcase import FileBasedTesting
 from testing_utils import check_json_scan
 from testing_utils import run_scan_click
 
+from tracecode import checksums
 from tracecode import cli
 
 
@@ -66,6 +73,271 @@ class TestCLI(FileBasedTesting):
 
         check_json_scan(expected_json, result_file, regen=False)
 
+    def test_cli_with_regular_json_compact(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        expected_json = self.get_test_loc('cli/basic/expected.json')
+
+        result_file = self.get_temp_file('json')
+
+        args = ['--develop', develop_json, '--deploy',
+                deploy_json, '--compact', '-j', result_file]
+        run_scan_click(args)
+
+        with open(result_file) as result:
+            assert len(result.read().splitlines()) == 1
+        check_json_scan(expected_json, result_file, regen=False)
+
+    def test_cli_with_regular_jsonl(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        expected_json = self.get_test_loc('cli/basic/expected.json')
+
+        result_file = self.get_temp_file('jsonl')
+
+        args = ['--develop', develop_json, '--deploy',
+                deploy_json, '--jsonl', result_file]
+        result = run_scan_click(args)
+        assert 'tracecode_results' not in result.output
+
+        with io.open(result_file, encoding='utf-8') as res:
+            lines = [json.loads(line, object_pairs_hook=OrderedDict) for line in res]
+        headers = lines[0]
+        headers['tracecode_results'] = lines[1:]
+
+        result_file = self.get_temp_file('json')
+        with io.open(result_file, 'w', encoding='utf-8') as res:
+            res.write(json.dumps(headers))
+        check_json_scan(expected_json, result_file, regen=False)
+
+    def test_cli_with_timing(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+
+        for compact in ([], ['--compact']):
+            result_file = self.get_temp_file('json')
+            args = ['--develop', develop_json, '--deploy',
+                    deploy_json, '--timing', '-j', result_file] + compact
+            run_scan_click(args)
+
+            with io.open(result_file, encoding='utf-8') as res:
+                results = json.load(res, object_pairs_hook=OrderedDict)
+            timings = results['tracecode_timings']
+            assert ['loading', 'indexing', 'checksum_matching', 'path_matching',
+                    'serialization'] == list(timings)
+            for timing in timings.values():
+                assert ['wall_time', 'cpu_time', 'peak_rss'] == list(timing)
+                assert timing['wall_time'] >= 0
+            assert results['tracecode_results']
+
+    def test_cli_with_jsonl_and_timing(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        result_file = self.get_temp_file('jsonl')
+        args = ['--develop', develop_json, '--deploy', deploy_json,
+                '--timing', '--jsonl', result_file]
+        run_scan_click(args)
+
+        with io.open(result_file, encoding='utf-8') as res:
+            lines = [json.loads(line, object_pairs_hook=OrderedDict) for line in res]
+        timings = lines[-1]['tracecode_timings']
+        assert ['loading', 'indexing', 'checksum_matching', 'path_matching',
+                'serialization'] == list(timings)
+        assert all('tracecode_timings' not in line for line in lines[:-1])
+
+    def test_cli_with_incremental_refuses_changed_scans(self):
+        test_dir = self.get_temp_dir()
+        develop_json = os.path.join(test_dir, 'develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        with io.open(self.get_test_loc('cli/basic/develop.json'), encoding='utf-8') as scan:
+            develop_scan = json.load(scan, object_pairs_hook=OrderedDict)
+        with io.open(develop_json, 'w', encoding='utf-8') as out:
+            out.write(json.dumps(develop_scan))
+        previous_file = self.get_temp_file('json')
+        run_scan_click(['--develop', develop_json, '--deploy', deploy_json, '--scan-hashes',
+                        '-j', previous_file])
+        with io.open(previous_file, encoding='utf-8') as previous:
+            scan_hashes = json.load(previous)['tracecode_scan_hashes']
+        assert ['develop', 'deploy'] == list(scan_hashes)
+
+        # the develop scan is regenerated in place
+        develop_scan['files'][1]['sha1'] = 'changed'
+        with io.open(develop_json, 'w', encoding='utf-8') as out:
+            out.write(json.dumps(develop_scan))
+        args = ['--develop', develop_json, '--deploy', deploy_json,
+                '--incremental', previous_file, '-j', self.get_temp_file('json')]
+        result = run_scan_click(args, expected_rc=1)
+        assert 'Scan of the previous analysis changed since' in result.output
+
+    def test_cli_does_not_hash_scans_by_default(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        result_file = self.get_temp_file('json')
+        run_scan_click(['--develop', develop_json, '--deploy', deploy_json, '-j', result_file])
+        with io.open(result_file, encoding='utf-8') as result:
+            headers = json.load(result)
+        assert 'tracecode_scan_hashes' not in headers
+        assert ['--develop', '--deploy'] == list(headers['tracecode_options'])
+
+        result = run_scan_click(['--develop', develop_json, '--deploy', deploy_json,
+                                 '--incremental', result_file], expected_rc=1)
+        assert 'run it with --scan-hashes' in result.output
+
+    def test_cli_with_progress(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        expected_json = self.get_test_loc('cli/basic/expected.json')
+
+        result_file = self.get_temp_file('json')
+        args = ['--develop', develop_json, '--deploy',
+                deploy_json, '--progress', '-j', result_file]
+        result = run_scan_click(args)
+        assert 'Path matching' in result.output
+        check_json_scan(expected_json, result_file, regen=False)
+
+    def test_cli_with_profile(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        expected_json = self.get_test_loc('cli/basic/expected.json')
+
+        result_file = self.get_temp_file('json')
+        stats_file = self.get_temp_file('pstats')
+        counters_file = self.get_temp_file('json')
+        args = ['--develop', develop_json, '--deploy', deploy_json,
+                '--profile', stats_file, '--profile-counters', counters_file,
+                '-j', result_file]
+        run_scan_click(args)
+        check_json_scan(expected_json, result_file, regen=False)
+
+        stats = pstats.Stats(stats_file)
+        assert any(func_name == 'checksum_match' for _, _, func_name in stats.stats)
+
+        with io.open(counters_file, encoding='utf-8') as res:
+            counters = json.load(res)
+        match_counter = counters['match_paths']
+        assert match_counter['calls'] == 48
+        assert match_counter['matched'] > 0
+        assert match_counter['stem_candidates'] >= match_counter['matched']
+        assert 'common_path_suffix' not in counters
+        assert counters['add_deployed_resource']['added'] > 0
+        assert counters['remove_file_suffix']['calls'] > 0
+
+    def test_cli_with_directory_match(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        result_file = self.get_temp_file('json')
+        args = ['--develop', develop_json, '--deploy', deploy_json,
+                '--directory-match', '-j', result_file]
+        run_scan_click(args)
+
+        with io.open(result_file, encoding='utf-8') as res:
+            results = json.load(res)
+        matchers = set(deployed['matcher'] for result in results['tracecode_results']
+                       for deployed in result['deployed_to'])
+        assert 'directory match' in matchers
+
+    def test_cli_with_java_match(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        expected_json = self.get_test_loc('cli/basic/expected.json')
+        result_file = self.get_temp_file('json')
+        args = ['--develop', develop_json, '--deploy', deploy_json,
+                '--java-match', '-j', result_file]
+        run_scan_click(args)
+        # there are no class files to match
+        check_json_scan(expected_json, result_file, regen=False)
+
+    def test_cli_with_merge_checksum_join(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        expected_json = self.get_test_loc('cli/basic/expected.json')
+        result_file = self.get_temp_file('json')
+        args = ['--develop', develop_json, '--deploy', deploy_json,
+                '--checksum-join', 'merge', '-j', result_file]
+        numpy = checksums.numpy
+        try:
+            checksums.numpy = None
+            result = run_scan_click(args, expected_rc=2)
+            assert 'requires the optional numpy library' in result.output
+        finally:
+            checksums.numpy = numpy
+
+        if numpy is not None:
+            run_scan_click(args)
+            check_json_scan(expected_json, result_file, regen=False)
+
+    def test_cli_with_several_deploys(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        expected_json = self.get_test_loc('cli/basic/expected.json')
+        output_dir = self.get_temp_dir()
+
+        args = ['--develop', develop_json, '--deploy', deploy_json,
+                '--deploy', deploy_json, '--output-dir', output_dir, '-n', '2']
+        run_scan_click(args)
+        assert ['2-deploy.json', 'deploy.json'] == sorted(os.listdir(output_dir))
+        for name in os.listdir(output_dir):
+            check_json_scan(expected_json, os.path.join(output_dir, name), regen=False)
+
+    def test_cli_with_several_deploys_with_spawned_processes(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        expected_json = self.get_test_loc('cli/basic/expected.json')
+        output_dir = self.get_temp_dir()
+
+        # the default start method on Windows and macOS: nothing is inherited
+        # from the parent process and the worker arguments are pickled
+        code = ('import multiprocessing; from tracecode.cli import cli; '
+                'multiprocessing.set_start_method("spawn"); cli()')
+        args = ['--develop', develop_json, '--deploy', deploy_json,
+                '--deploy', deploy_json, '--output-dir', output_dir, '-n', '2']
+        subprocess.check_call([sys.executable, '-c', code] + args)
+        assert ['2-deploy.json', 'deploy.json'] == sorted(os.listdir(output_dir))
+        for name in os.listdir(output_dir):
+            check_json_scan(expected_json, os.path.join(output_dir, name), regen=False)
+
+    def test_cli_with_manifest(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        expected_json = self.get_test_loc('cli/basic/expected.json')
+        test_dir = self.get_temp_dir()
+        manifest = os.path.join(test_dir, 'manifest.json')
+        with io.open(manifest, 'w', encoding='utf-8') as out:
+            out.write(json.dumps([{'deploy': deploy_json, 'output': 'result.json'}]))
+
+        run_scan_click(['--develop', develop_json, '--manifest', manifest])
+        check_json_scan(expected_json, os.path.join(test_dir, 'result.json'), regen=False)
+
+    def test_cli_with_invalid_manifest(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        manifest = self.get_temp_file('json')
+        for entries in ({'deploy': 'deploy.json'}, ['deploy.json'],
+                        [{'deploy': 'deploy.json'}], [{'deploy': 1, 'output': 'out.json'}]):
+            with io.open(manifest, 'w', encoding='utf-8') as out:
+                out.write(json.dumps(entries))
+            result = run_scan_click(['--develop', develop_json, '--manifest', manifest],
+                                    expected_rc=2)
+            assert 'Invalid --manifest' in result.output
+
+    def test_cli_with_several_deploys_requires_output_dir(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        args = ['--develop', develop_json, '--deploy', deploy_json, '--deploy', deploy_json]
+        result = run_scan_click(args, expected_rc=2)
+        assert '--output-dir is required' in result.output
+
+    def test_cli_query(self):
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        index_cache = self.get_temp_dir()
+        path = 'samples/src/JGroups/EULA'
+        for _ in range(2):
+            result = run_scan_click(['query', '--deploy', deploy_json,
+                                     '--index-cache', index_cache, path])
+            results = json.loads(result.output)
+            assert path == results['path']
+            assert results['deployed_to']
+        assert 1 == len(os.listdir(index_cache))
+
     def test_help(self):
         runner = CliRunner()
         result = runner.invoke(cli.cli, ['--help'])
@@ -80,6 +352,12 @@ class TestCLI(FileBasedTesting):
 
         assert 'TraceCode version 1.0.0' in result.output
 
+    def test_cli_does_not_import_scancode_until_needed(self):
+        code = ('import sys; from tracecode import cli; '
+                'assert "scancode.resource" not in sys.modules; '
+                'assert "tracecode.matchers" not in sys.modules')
+        subprocess.check_call([sys.executable, '-c', code])
+
     def test_empty(self):
         runner = CliRunner()
         result = runner.invoke(cli.cli, [])
@@ -0,0 +1,84 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import os
+
+from commoncode.testcase import FileBasedTesting
+from scancode.resource import VirtualCodebase
+
+from tracecode import codebase
+from tracecode.codebase import LeanCodebase
+
+
+class TestLeanCodebase(FileBasedTesting):
+
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+    def check_walk_like_virtual_codebase(self, test_file):
+        test_loc = self.get_test_loc(test_file)
+        expected = [r.path for r in VirtualCodebase(test_loc).walk()]
+        result = [r.path for r in LeanCodebase(test_loc).walk()]
+        assert expected == result
+
+    def test_walk_is_in_virtual_codebase_order(self):
+        self.check_walk_like_virtual_codebase('cli/basic/deploy.json')
+
+    def test_walk_creates_missing_parent_directories(self):
+        self.check_walk_like_virtual_codebase('matchers/class/develop.json')
+
+    def test_walk_without_ijson(self):
+        ijson = codebase.ijson
+        try:
+            codebase.ijson = None
+            self.check_walk_like_virtual_codebase('cli/basic/deploy.json')
+        finally:
+            codebase.ijson = ijson
+
+    def test_resources_keep_only_path_type_and_fields(self):
+        test_loc = self.get_test_loc('matchers/checksumindex/develop.json')
+        lean_codebase = LeanCodebase(test_loc, fields=('sha1', 'md5', 'sha256'))
+        results = [r.to_dict() for r in lean_codebase.walk()]
+        expected = [
+            OrderedDict([('path', 'samples'), ('type', 'directory'),
+                         ('sha1', None), ('md5', None)]),
+            OrderedDict([('path', 'samples/README'), ('type', 'file'),
+                         ('sha1', '2e07e32c52d607204fad196052d70e3d18fb8636'),
+                         ('md5', 'effc6856ef85a9250fb1a470792b3f38')]),
+            OrderedDict([('path', 'samples/screenshot.png'), ('type', 'file'),
+                         ('sha1', '01ff4b1de0bc6c75c9cca6e46c80c1802d6976d4'),
+                         ('md5', 'b6ef5a90777147423c98b42a6a25e57a')]),
+        ]
+        assert expected == results
+
+    def test_empty_scan_raises_exception(self):
+        test_loc = self.get_test_loc('utils/empty/deploy.json')
+        self.assertRaises(Exception, LeanCodebase, test_loc)
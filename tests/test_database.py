@@ -0,0 +1,149 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import io
+import json
+import os
+
+import pytest
+
+from commoncode.testcase import FileBasedTesting
+from testing_utils import check_json_scan
+from testing_utils import run_scan_click
+
+from tracecode import utils
+from tracecode.output import write_json
+from tracecode.codebase import get_walk_key
+from tracecode.database import SqliteDeploymentAnalysis
+from tracecode.database import get_top_matches
+from tracecode.database import get_walk_sort_key
+from tracecode.matchers import DeploymentAnalysis
+
+
+class TestDatabase(FileBasedTesting):
+
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+    def test_sqlite_deploymentanalysis_class(self):
+        develop_json = self.get_test_loc('matchers/class/develop.json')
+        deploy_json = self.get_test_loc('matchers/class/deploy.json')
+        expected_file = self.get_test_loc('matchers/class/expected_lean.json')
+        da = SqliteDeploymentAnalysis(develop_json, deploy_json, options=OrderedDict([
+            ('--develop', develop_json),
+            ('--deploy', deploy_json),
+            ('--lean', True),
+        ]), db_location=self.get_temp_file('sqlite'))
+        result_file = self.get_temp_file('json')
+        with open(result_file, 'w') as rfile:
+            write_json(analysis=da, outfile=rfile)
+        da.close()
+        check_json_scan(expected_file, result_file, regen=False)
+
+    def test_sqlite_deploymentanalysis_is_the_same_as_lean_deploymentanalysis(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        expected = DeploymentAnalysis(develop_json, deploy_json, options={}, lean=True)
+        da = SqliteDeploymentAnalysis(develop_json, deploy_json, options={})
+        try:
+            results = [tr.to_dict() for tr in da.analysed_result.values()]
+            assert [tr.to_dict() for tr in expected.analysed_result.values()] == results
+            assert len(expected.analysed_result) == len(da.analysed_result)
+        finally:
+            da.close()
+        assert not os.path.exists(da.db_location)
+
+    @pytest.mark.skipif(not utils.ijson, reason='The optional ijson library is not installed')
+    def test_cli_with_out_of_core(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        result_file = self.get_temp_file('json')
+        args = ['--develop', develop_json, '--deploy', deploy_json,
+                '--out-of-core', '--timing', '-j', result_file]
+        run_scan_click(args)
+        with open(result_file) as result:
+            assert '"tracecode_timings"' in result.read()
+
+    def test_cli_with_out_of_core_requires_ijson(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        args = ['--develop', develop_json, '--deploy', deploy_json, '--out-of-core']
+        ijson = utils.ijson
+        try:
+            utils.ijson = None
+            result = run_scan_click(args, expected_rc=2)
+        finally:
+            utils.ijson = ijson
+        assert 'requires the optional ijson library' in result.output
+
+    def test_cli_with_out_of_core_rejects_incompatible_options(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        for other_options in (['--index-cache', self.get_temp_dir()], ['--directory-match'],
+                              ['--java-match']):
+            args = ['--develop', develop_json, '--deploy', deploy_json, '--out-of-core']
+            result = run_scan_click(args + other_options, expected_rc=2)
+            assert 'cannot be combined with' in result.output
+
+    def test_sqlite_deploymentanalysis_path_matches_large_stem_groups(self):
+        # more deploy files with the same stem than compared one by one
+        develop_files = ['proj/pkg{}/mod/__init__.py'.format(i) for i in range(30)]
+        develop_files += ['proj/other/__init__.py', 'proj/pkg3/__init__.py']
+        deploy_files = ['site/pkg{}/mod/__init__.py'.format(i) for i in range(0, 60, 2)]
+        deploy_files += ['site/pkg3/__init__.py', 'lib/pkg3/__init__.py']
+        locations = []
+        for paths in (develop_files, deploy_files):
+            location = self.get_temp_file('json')
+            with io.open(location, 'w', encoding='utf-8') as out:
+                out.write(json.dumps({'files': [
+                    dict(path=path, type='file', sha1='{:040d}'.format(i + len(locations) * 100))
+                    for i, path in enumerate(paths)]}))
+            locations.append(location)
+
+        expected = DeploymentAnalysis(locations[0], locations[1], options={}, lean=True)
+        da = SqliteDeploymentAnalysis(locations[0], locations[1], options={})
+        try:
+            results = [tr.to_dict() for tr in da.analysed_result.values()]
+            assert [tr.to_dict() for tr in expected.analysed_result.values()] == results
+        finally:
+            da.close()
+
+    def test_get_walk_sort_key_sorts_as_get_walk_key(self):
+        paths = [('a', True), ('a/b', True), ('a/b/c', False), ('a/B', False),
+                 ('a/ab', False), ('a/abc', True), ('a/abc/d', False), ('A', False)]
+        expected = sorted(paths, key=lambda p: get_walk_key(*p))
+        assert expected == sorted(paths, key=lambda p: get_walk_sort_key(*p))
+
+    def test_get_top_matches(self):
+        candidates = [(1, ['core', 'ui', 'a']), (2, ['core', 'ui', 'b']), (3, ['core', 'c'])]
+        assert [1, 2] == get_top_matches(['core', 'ui', 'src'], candidates)
+        assert [] == get_top_matches(['core', 'src'], candidates)
+        assert [3] == get_top_matches(['core', 'src'], candidates[2:])
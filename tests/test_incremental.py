@@ -0,0 +1,151 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import io
+import json
+import os
+
+from commoncode.testcase import FileBasedTesting
+
+from tracecode.output import write_json
+from tracecode.incremental import get_scan_hashes
+from tracecode.incremental import PreviousAnalysis
+from tracecode.matchers import DeploymentAnalysis
+
+
+class TestIncremental(FileBasedTesting):
+
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+    def get_scan(self, location):
+        with io.open(location, encoding='utf-8') as scan:
+            return json.load(scan, object_pairs_hook=OrderedDict)
+
+    def write_scan(self, scan):
+        location = self.get_temp_file('json')
+        with io.open(location, 'w', encoding='utf-8') as out:
+            out.write(json.dumps(scan))
+        return location
+
+    def run_analysis(self, develop_json, deploy_json, previous=None):
+        options = OrderedDict([('--develop', develop_json), ('--deploy', deploy_json)])
+        return DeploymentAnalysis(develop_json, deploy_json, options=options, previous=previous,
+                                  scan_hashes=get_scan_hashes(develop_json, deploy_json))
+
+    def get_results(self, analysis):
+        return [tr.to_dict() for tr in analysis.analysed_result.values()]
+
+    def test_incremental_analysis_is_the_same_as_a_full_analysis(self):
+        develop_scan = self.get_scan(self.get_test_loc('cli/basic/develop.json'))
+        deploy_scan = self.get_scan(self.get_test_loc('cli/basic/deploy.json'))
+        previous_develop_json = self.write_scan(develop_scan)
+        previous_deploy_json = self.write_scan(deploy_scan)
+
+        previous_result = self.get_temp_file('json')
+        analysis = self.run_analysis(previous_develop_json, previous_deploy_json)
+        with io.open(previous_result, 'wb') as out:
+            write_json(analysis, out)
+
+        # a changed and a removed develop file
+        develop_files = develop_scan['files']
+        for data in develop_files:
+            if data['path'] == 'samples/src/JGroups/EULA':
+                data['sha1'] = data['md5'] = 'changed'
+        develop_scan['files'] = [data for data in develop_files
+                                 if data['path'] != 'samples/src/README']
+
+        # a changed and a removed deploy file
+        deploy_files = deploy_scan['files']
+        zlib_sha1 = [data['sha1'] for data in develop_files
+                     if data['path'] == 'samples/src/zlib/zlib.h'][0]
+        for data in deploy_files:
+            if data['path'] == 'samples/zlib/zutil.c':
+                data['sha1'] = zlib_sha1
+        deploy_scan['files'] = [data for data in deploy_files
+                                if data['path'] != 'samples/JGroups/LICENSE']
+
+        develop_json = self.write_scan(develop_scan)
+        deploy_json = self.write_scan(deploy_scan)
+        expected = self.get_results(self.run_analysis(develop_json, deploy_json))
+
+        incremental = self.run_analysis(
+            develop_json, deploy_json, previous=PreviousAnalysis(previous_result))
+        assert expected == self.get_results(incremental)
+
+        expected_affected = set([
+            'samples/src/JGroups/EULA',
+            'samples/src/JGroups/LICENSE',
+            'samples/src/zlib/zlib.h',
+            'samples/src/zlib/zutil.c',
+        ])
+        assert expected_affected == incremental.affected_paths
+
+    def test_previous_analysis_requires_previous_scans(self):
+        previous_result = self.get_temp_file('json')
+        with io.open(previous_result, 'w', encoding='utf-8') as out:
+            out.write(json.dumps({'tracecode_options': {
+                '--develop': 'does-not-exist.json', '--deploy': 'does-not-exist.json'}}))
+        self.assertRaises(Exception, PreviousAnalysis, previous_result)
+
+    def write_previous_result(self, develop_json, deploy_json):
+        previous_result = self.get_temp_file('json')
+        analysis = self.run_analysis(develop_json, deploy_json)
+        with io.open(previous_result, 'wb') as out:
+            write_json(analysis, out)
+        return previous_result
+
+    def test_previous_analysis_requires_unchanged_previous_scans(self):
+        develop_scan = self.get_scan(self.get_test_loc('cli/basic/develop.json'))
+        develop_json = self.write_scan(develop_scan)
+        deploy_json = self.write_scan(self.get_scan(self.get_test_loc('cli/basic/deploy.json')))
+        previous_result = self.write_previous_result(develop_json, deploy_json)
+        assert PreviousAnalysis(previous_result).path_matches_by_path
+
+        # the scan is regenerated in place
+        develop_scan['files'][1]['sha1'] = 'changed'
+        with io.open(develop_json, 'w', encoding='utf-8') as out:
+            out.write(json.dumps(develop_scan))
+        try:
+            PreviousAnalysis(previous_result)
+            assert False, 'A changed scan should not be reused'
+        except Exception as e:
+            assert 'changed since' in str(e)
+
+    def test_previous_analysis_requires_scan_hashes(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        previous_result = self.get_temp_file('json')
+        analysis = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict([
+            ('--develop', develop_json), ('--deploy', deploy_json)]))
+        with io.open(previous_result, 'wb') as out:
+            write_json(analysis, out)
+        self.assertRaises(Exception, PreviousAnalysis, previous_result)
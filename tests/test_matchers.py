@@ -29,14 +29,29 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 from collections import OrderedDict
+import io
+import json
 import os.path
 
 from scancode.resource import VirtualCodebase
 
 from tracecode.cli import write_json
+from tracecode.matchers import DIRECTORY_MATCH
+from tracecode.matchers import DeployIndex
 from tracecode.matchers import DeploymentAnalysis
 from tracecode.matchers import get_checksum_index
+from tracecode.matchers import get_checksums_index
 from tracecode.matchers import match_paths
+from tracecode.matchers import PathIndex
+from tracecode.matchers import CHECKSUM_MATCH
+from tracecode.matchers import EXACT_CONFIDENCE
+from tracecode.matchers import HIGH_CONFIDENCE
+from tracecode.matchers import JAVA_MATCH
+from tracecode.matchers import MEDIUM_CONFIDENCE
+from tracecode.matchers import MERGE_JOIN
+from tracecode.matchers import MatchedResource
+from tracecode.matchers import PATH_MATCH
+from tracecode.matchers import TracecodeResource
 from tracecode.matchers import remove_file_suffix
 
 from commoncode.testcase import FileBasedTesting
@@ -83,6 +98,51 @@ class TestMatchers(FileBasedTesting):
         result = match_paths(path1, path2)
         assert list(result) == expected
 
+    def test_path_matcher_with_path_index(self):
+        path1 = '/home/test/src/com/nexb/plugin/ui/core.java'
+        index = PathIndex(['com/nexb/plugin/ui/core.class',
+                           'org/other/ui/core.class',
+                           'com/nexb/plugin/ui/test.class'])
+        expected = [u'com/nexb/plugin/ui/core.class']
+        result = match_paths(path1, index)
+        assert list(result) == expected
+
+    def test_match_paths_with_paths_list_ignores_other_stems(self):
+        paths2 = ['a/plugin/ui/core.class', 'b/plugin/ui/other.class', 'c/ui/core.class']
+        expected = [u'a/plugin/ui/core.class']
+        assert list(match_paths('/home/src/plugin/ui/core.java', paths2)) == expected
+        assert list(match_paths('/home/src/plugin/ui/none.java', paths2)) == []
+
+    def test_path_index_match_returns_all_top_matches_in_order(self):
+        index = PathIndex(['b/plugin/ui/core.class',
+                           'a/plugin/ui/core.class',
+                           'a/other/core.class'])
+        expected = [u'b/plugin/ui/core.class', u'a/plugin/ui/core.class']
+        result = index.match('/home/src/plugin/ui/core.java')
+        assert list(result) == expected
+
+    def test_path_index_match_skips_ambiguous_file_name_matches(self):
+        index = PathIndex(['a/core.class', 'b/core.class'])
+        assert list(index.match('/home/src/core.java')) == []
+
+        index = PathIndex(['a/core.class', 'b/test.class'])
+        assert list(index.match('/home/src/core.java')) == [u'a/core.class']
+
+    def test_path_index_get_key_interns_indexed_segments(self):
+        index = PathIndex(['a/plugin/core.class'])
+        key = index.get_key('/home/src/plugin/core.java')
+        assert key == ('core', 'plugin', 'src', 'home')
+        indexed = index.get_key('a/plugin/core.class')
+        assert key[0] is indexed[0]
+        assert key[1] is indexed[1]
+        assert 'home' not in index.segments
+        assert list(index.match(None, key)) == ['a/plugin/core.class']
+
+    def test_path_index_match_no_match(self):
+        index = PathIndex(['a/core.class', 'b/test.class'])
+        assert list(index.match('/home/src/readme')) == []
+        assert list(index.match('/')) == []
+
     def test_get_checksum_index_sha1(self):
         develop_json = self.get_test_loc('matchers/checksumindex/develop.json')
         codebase = VirtualCodebase(develop_json)
@@ -100,6 +160,51 @@ class TestMatchers(FileBasedTesting):
                     u'effc6856ef85a9250fb1a470792b3f38': [u'samples/README']}
         assert expected == result
 
+    def test_get_checksums_index(self):
+        develop_json = self.get_test_loc('matchers/checksumindex/develop.json')
+        codebase = VirtualCodebase(develop_json)
+        result = get_checksums_index(codebase)
+        expected = OrderedDict([
+            ('sha1', {u'01ff4b1de0bc6c75c9cca6e46c80c1802d6976d4': [u'samples/screenshot.png'],
+                      u'2e07e32c52d607204fad196052d70e3d18fb8636': [u'samples/README']}),
+            ('md5', {u'b6ef5a90777147423c98b42a6a25e57a': [u'samples/screenshot.png'],
+                     u'effc6856ef85a9250fb1a470792b3f38': [u'samples/README']}),
+        ])
+        assert expected == result
+
+    def test_add_deployed_resource_checksum_match_takes_precedence(self):
+        trace_resource = TracecodeResource(resource=None)
+        trace_resource.add_deployed_resource(
+            MatchedResource('a/b.c', CHECKSUM_MATCH, EXACT_CONFIDENCE, 'sha1'))
+        trace_resource.add_deployed_resource(
+            MatchedResource('a/d.c', PATH_MATCH, HIGH_CONFIDENCE))
+        trace_resource.add_deployed_resource(
+            MatchedResource('a/b.c', CHECKSUM_MATCH, EXACT_CONFIDENCE, 'md5'))
+        trace_resource.add_deployed_resource(
+            MatchedResource('a/b.c', PATH_MATCH, HIGH_CONFIDENCE))
+        trace_resource.add_deployed_resource(
+            MatchedResource('a/d.c', CHECKSUM_MATCH, EXACT_CONFIDENCE, 'md5'))
+        expected = [
+            MatchedResource('a/b.c', CHECKSUM_MATCH, EXACT_CONFIDENCE, 'sha1'),
+            MatchedResource('a/d.c', CHECKSUM_MATCH, EXACT_CONFIDENCE, 'md5'),
+        ]
+        assert expected == trace_resource.deployed_resources
+
+    def test_add_deployed_resource_with_many_matches(self):
+        trace_resource = TracecodeResource(resource=None)
+        paths = ['a/%d.c' % i for i in range(40)]
+        for path in paths:
+            trace_resource.add_deployed_resource(
+                MatchedResource(path, PATH_MATCH, HIGH_CONFIDENCE))
+        for path in reversed(paths):
+            trace_resource.add_deployed_resource(
+                MatchedResource(path, CHECKSUM_MATCH, EXACT_CONFIDENCE, 'sha1'))
+            trace_resource.add_deployed_resource(
+                MatchedResource(path, PATH_MATCH, HIGH_CONFIDENCE))
+        expected = [MatchedResource(path, CHECKSUM_MATCH, EXACT_CONFIDENCE, 'sha1')
+                    for path in paths]
+        assert expected == trace_resource.deployed_resources
+
     def test_deploymentanalysis_class(self):
         develop_json = self.get_test_loc('matchers/class/develop.json')
         deploy_json = self.get_test_loc('matchers/class/deploy.json')
@@ -113,3 +218,156 @@ class TestMatchers(FileBasedTesting):
         with open(result_file, 'w') as rfile:
             write_json(analysis=da, outfile=rfile)
         check_json_scan(expected_file, result_file, regen=False)
+
+    def test_deploymentanalysis_class_lean(self):
+        develop_json = self.get_test_loc('matchers/class/develop.json')
+        deploy_json = self.get_test_loc('matchers/class/deploy.json')
+        expected_file = self.get_test_loc('matchers/class/expected_lean.json')
+        da = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict([
+            ('--develop', develop_json),
+            ('--deploy', deploy_json),
+            ('--lean', True),
+        ]), lean=True
+        )
+        result_file = self.get_temp_file('json')
+        with open(result_file, 'w') as rfile:
+            write_json(analysis=da, outfile=rfile)
+        check_json_scan(expected_file, result_file, regen=False)
+
+    def test_deploymentanalysis_basic_with_processes(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        expected_file = self.get_test_loc('cli/basic/expected.json')
+        da = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict([
+            ('--develop', develop_json),
+            ('--deploy', deploy_json),
+            ('--processes', 2),
+        ]), processes=2
+        )
+        result_file = self.get_temp_file('json')
+        with open(result_file, 'w') as rfile:
+            write_json(analysis=da, outfile=rfile)
+        check_json_scan(expected_file, result_file, regen=False)
+
+    def test_deploymentanalysis_reports_progress(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        reports = []
+
+        def progress(p):
+            reports.append((p.phase, p.processed, p.total, p.matches))
+
+        da = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict(),
+                                progress=progress)
+        total = len(da.develop_paths)
+        matches = len(da.analysed_result)
+        assert ('checksum matching', 0, total, 0) == reports[0]
+        assert ('path matching', total, total, matches) == reports[-1]
+        assert ['checksum matching', 'path matching'] == sorted(set(r[0] for r in reports))
+
+    def test_deploy_index_query_is_the_same_as_an_analysis(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        da = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict())
+
+        for checksum_join in ('index', MERGE_JOIN):
+            deploy_index = DeployIndex.from_location(deploy_json, checksum_join=checksum_join)
+            for resource in da.develop_codebase.walk():
+                checksums = dict((checksumtype, getattr(resource, checksumtype, None))
+                                 for checksumtype in ('sha1', 'md5'))
+                trace_resource = da.analysed_result.get(resource.path)
+                expected = trace_resource.deployed_resources if trace_resource else []
+                assert expected == deploy_index.query(resource.path, checksums)
+
+    def test_deploy_index_query_without_checksums(self):
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        deploy_index = DeployIndex.from_location(deploy_json)
+        assert [] == deploy_index.query('foo/not-deployed.c')
+        for matched in deploy_index.query('samples/src/JGroups/EULA'):
+            assert PATH_MATCH == matched.matcher
+
+    def test_deploymentanalysis_directory_match(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        da = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict(),
+                                directory_match=True)
+        pairs = da.directory_pairs.deploy_dirs_by_develop_dir
+        assert [('samples', 1.0)] == pairs['samples/src']
+        assert [('samples/zlib/ada', 1.0)] == pairs['samples/src/zlib/ada']
+        assert 'samples' not in pairs
+
+        expected = [MatchedResource('samples/JGroups', DIRECTORY_MATCH, HIGH_CONFIDENCE)]
+        assert expected == da.analysed_result['samples/src/JGroups'].deployed_resources
+
+        # the file matches are the same
+        basic = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict())
+        for path, trace_resource in basic.analysed_result.items():
+            if trace_resource.resource.is_file:
+                assert (trace_resource.deployed_resources
+                        == da.analysed_result[path].deployed_resources)
+
+    def write_scan(self, files):
+        location = self.get_temp_file('json')
+        with io.open(location, 'w', encoding='utf-8') as out:
+            out.write(json.dumps({'files': [
+                dict(path=path, type='file', sha1=sha1) for path, sha1 in files]}))
+        return location
+
+    def test_deploymentanalysis_directory_match_limits_path_matches(self):
+        develop_json = self.write_scan([
+            ('proj/src/a.c', 'a' * 40),
+            ('proj/src/b.c', 'b' * 40),
+            ('proj/src/util.h', 'c' * 40),
+            ('proj/src/new.c', 'f' * 40),
+        ])
+        deploy_json = self.write_scan([
+            ('out/lib/a.c', 'a' * 40),
+            ('out/lib/b.c', 'b' * 40),
+            ('out/lib/util.h', 'd' * 40),
+            ('other/src/util.h', 'e' * 40),
+        ])
+
+        da = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict())
+        expected = [MatchedResource('other/src/util.h', PATH_MATCH, HIGH_CONFIDENCE)]
+        assert expected == da.analysed_result['proj/src/util.h'].deployed_resources
+
+        da = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict(),
+                                lean=True, directory_match=True)
+        expected = [MatchedResource('out/lib', DIRECTORY_MATCH, MEDIUM_CONFIDENCE)]
+        assert expected == da.analysed_result['proj/src'].deployed_resources
+        expected = [MatchedResource('out/lib/util.h', PATH_MATCH, HIGH_CONFIDENCE)]
+        assert expected == da.analysed_result['proj/src/util.h'].deployed_resources
+
+    def test_deploymentanalysis_java_match(self):
+        develop_json = self.write_scan([
+            ('app/src/main/java/com/acme/Foo.java', 'a' * 40),
+            ('app/src/main/java/com/acme/Bar.java', 'b' * 40),
+            ('app/src/main/java/com/acme/Baz.java', 'c' * 40),
+        ])
+        deploy_json = self.write_scan([
+            ('app.jar-extract/com/acme/Foo.class', 'd' * 40),
+            ('app.jar-extract/com/acme/Foo$Inner.class', 'e' * 40),
+            ('app.jar-extract/com/acme/Foo$1.class', 'f' * 40),
+            ('other.jar-extract/org/acme/Foo.class', '0' * 40),
+            ('lib/com/acme/Bar.class', '1' * 40),
+        ])
+
+        da = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict())
+        expected = [MatchedResource('app.jar-extract/com/acme/Foo.class', PATH_MATCH, HIGH_CONFIDENCE)]
+        assert expected == da.analysed_result['app/src/main/java/com/acme/Foo.java'].deployed_resources
+
+        da = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict(),
+                                java_match=True)
+        # in the deploy walk order
+        expected = [
+            MatchedResource('app.jar-extract/com/acme/Foo$1.class', JAVA_MATCH, HIGH_CONFIDENCE),
+            MatchedResource('app.jar-extract/com/acme/Foo$Inner.class', JAVA_MATCH, HIGH_CONFIDENCE),
+            MatchedResource('app.jar-extract/com/acme/Foo.class', JAVA_MATCH, HIGH_CONFIDENCE),
+        ]
+        assert expected == da.analysed_result['app/src/main/java/com/acme/Foo.java'].deployed_resources
+        assert set(['app/src/main/java/com/acme/Foo.java']) == da.java_matched_paths
+
+        # a class without a known package root is still path matched
+        expected = [MatchedResource('lib/com/acme/Bar.class', PATH_MATCH, HIGH_CONFIDENCE)]
+        assert expected == da.analysed_result['app/src/main/java/com/acme/Bar.java'].deployed_resources
+        assert 'app/src/main/java/com/acme/Baz.java' not in da.analysed_result
@@ -0,0 +1,154 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/aboutcode-org/tracecode-toolkit/
+# The TraceCode software is licensed under the Apache License version 2.0.
+# Data generated with TraceCode require an acknowledgment.
+# TraceCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with TraceCode or any TraceCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with TraceCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  TraceCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  TraceCode is a free and open source software analysis tool from nexB Inc. and others.
+#  Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and download.
+#
+
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import io
+import json
+import os
+import threading
+
+try:
+    from urllib.request import urlopen
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import urlopen
+    from urllib2 import HTTPError
+
+from commoncode.testcase import FileBasedTesting
+from testing_utils import check_json_scan
+
+from tracecode.matchers import DeploymentAnalysis
+from tracecode.server import IndexCache
+from tracecode.server import make_server
+
+
+class TestServer(FileBasedTesting):
+
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+    def setUp(self):
+        self.httpd = make_server(port=0, quiet=True)
+        self.url = 'http://{}:{}'.format(*self.httpd.server_address[:2])
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+    def post(self, url_path, request):
+        data = json.dumps(request).encode('utf-8')
+        return urlopen(self.url + url_path, data).read().decode('utf-8')
+
+    def test_server_listens_only_on_loopback(self):
+        assert '127.0.0.1' == self.httpd.server_address[0]
+
+    def test_server_analyze(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        expected_json = self.get_test_loc('cli/basic/expected.json')
+
+        for _ in range(2):
+            result_file = self.get_temp_file('json')
+            result = self.post('/analyze', {'develop': develop_json, 'deploy': deploy_json})
+            with io.open(result_file, 'w', encoding='utf-8') as out:
+                out.write(result)
+            check_json_scan(expected_json, result_file, regen=False)
+
+        status = json.loads(urlopen(self.url + '/status').read().decode('utf-8'))
+        assert 2 == status['misses']
+        assert 2 == status['hits']
+        assert ['develop', 'deploy'] == [entry['kind'] for entry in status['entries']]
+
+    def test_server_query_is_the_same_as_an_analysis(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        analysis = DeploymentAnalysis(develop_json, deploy_json, options=OrderedDict())
+
+        for trace_resource in analysis.analysed_result.values():
+            resource = trace_resource.resource
+            checksums = dict((checksumtype, getattr(resource, checksumtype, None))
+                             for checksumtype in ('sha1', 'md5'))
+            request = {'deploy': deploy_json, 'path': resource.path, 'checksums': checksums}
+            result = json.loads(self.post('/query', request), object_pairs_hook=OrderedDict)
+            assert resource.path == result['path']
+            expected = trace_resource.to_dict()['deployed_to']
+            assert json.loads(json.dumps(expected)) == result['deployed_to']
+
+    def test_server_reports_invalid_requests(self):
+        deploy_json = self.get_test_loc('cli/invalid/deploy_notjson')
+        try:
+            self.post('/query', {'deploy': deploy_json, 'path': 'foo/bar.c'})
+            assert False, 'An invalid scan should fail'
+        except HTTPError as e:
+            assert 400 == e.code
+            assert 'not a json file' in e.read().decode('utf-8')
+
+    def test_server_reports_any_failure_as_json(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        empty_json = self.get_temp_file('json')
+        with io.open(empty_json, 'w', encoding='utf-8') as out:
+            out.write(json.dumps({'files': []}))
+
+        requests = [
+            ('/query', {'deploy': empty_json, 'path': 'foo/bar.c'}, 500),
+            ('/analyze', {'develop': 1, 'deploy': develop_json}, 400),
+            ('/query', {'deploy': develop_json, 'path': 'foo/bar.c', 'checksums': []}, 400),
+        ]
+        for url_path, request, expected_code in requests:
+            try:
+                self.post(url_path, request)
+                assert False, 'An invalid request should fail'
+            except HTTPError as e:
+                assert expected_code == e.code
+                assert 'error' in json.loads(e.read().decode('utf-8'))
+
+
+class TestIndexCache(FileBasedTesting):
+
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+    def test_index_cache_evicts_least_recently_used_indexes(self):
+        develop_json = self.get_test_loc('cli/basic/develop.json')
+        deploy_json = self.get_test_loc('cli/basic/deploy.json')
+        max_size = max(os.path.getsize(develop_json), os.path.getsize(deploy_json)) + 1
+        cache = IndexCache(max_size)
+
+        develop_index = cache.get_develop_index(develop_json)
+        assert develop_index is cache.get_develop_index(develop_json)
+        deploy_index = cache.get_deploy_index(deploy_json)
+        assert deploy_index is cache.get_deploy_index(deploy_json)
+        assert [('deploy', os.path.abspath(deploy_json), False)] == list(cache.entries)
+        assert develop_index is not cache.get_develop_index(develop_json)
+        assert 2 == cache.hits
+        assert 3 == cache.misses
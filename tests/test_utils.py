@@ -28,8 +28,12 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import io
+import json
 import os
 
+import pytest
+
 from commoncode.testcase import FileBasedTesting
 
 from tracecode import utils
@@ -64,3 +68,50 @@ Visit https://github.com/aboutcode-org/tracecode-toolkit/ for support and downlo
         develop_json = self.get_test_loc('utils/valid/deploy.json')
         is_json_file = utils.is_json_path(develop_json)
         assert is_json_file == True
+
+    def test_validate_scan_with_valid_json_file(self):
+        test_loc = self.get_test_loc('utils/valid/deploy.json')
+        assert utils.validate_scan(test_loc)
+
+    def test_validate_scan_with_invalid_json_files(self):
+        for test_file in ('utils/invalid/deploy_notjson', 'utils/invalid/develop.json',
+                          'utils/empty/deploy.json'):
+            test_loc = self.get_test_loc(test_file)
+            assert utils.validate_scan(test_loc) is None
+
+    def test_validate_scan_without_ijson_returns_decoded_scan(self):
+        ijson = utils.ijson
+        try:
+            utils.ijson = None
+            test_loc = self.get_test_loc('utils/valid/deploy.json')
+            result = utils.validate_scan(test_loc)
+            assert 47 == len(result['files'])
+            test_loc = self.get_test_loc('utils/invalid/develop.json')
+            assert utils.validate_scan(test_loc) is None
+        finally:
+            utils.ijson = ijson
+
+    def test_validate_scan_without_ijson_decodes_utf8(self):
+        test_loc = self.get_temp_file('json')
+        with io.open(test_loc, 'wb') as out:
+            out.write(json.dumps({'files': [{'path': 'caf\xe9/a.c'}]},
+                                 ensure_ascii=False).encode('utf-8'))
+        ijson = utils.ijson
+        try:
+            utils.ijson = None
+            result = utils.validate_scan(test_loc)
+        finally:
+            utils.ijson = ijson
+        assert 'caf\xe9/a.c' == result['files'][0]['path']
+
+    @pytest.mark.skipif(not utils.ijson, reason='The optional ijson library is not installed')
+    def test_is_scan_header_reads_only_the_start_of_the_files(self):
+        test_loc = self.get_temp_file('json')
+        with open(test_loc, 'w') as truncated:
+            truncated.write('{"headers": [{"tool_name": "scancode-toolkit"}], '
+                            '"files": [{"path": "samples", "ty')
+        assert utils.is_scan_header(test_loc)
+
+        with open(test_loc, 'w') as not_scan:
+            not_scan.write('{"headers": [], "files": {"path": "samples"}}')
+        assert not utils.is_scan_header(test_loc)
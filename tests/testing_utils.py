@@ -167,4 +167,5 @@ def streamline_headers(headers):
     """
     headers.pop('tracecode_version', None)
     headers.pop('tracecode_options', None)
+    headers.pop('tracecode_scan_hashes', None)
     streamline_errors(headers['tracecode_errors'])